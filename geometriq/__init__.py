@@ -1,8 +1,17 @@
 from .backends import *
+from .bezier import *
+from .clipping import *
 from .colors import *
+from .debug import *
+from .display_list import *
 from .grids import *
+from .intersections import *
+from .journal import *
 from .shapes import *
 from .solarized import *
+from .spatial import *
+from .topology import *
+from .transform import *
 
 try:
     from .reference_image import *
@@ -17,3 +17,8 @@ try:
     from .pillow import PillowCanvas
 except ImportError:
     pass
+
+try:
+    from .tiled import TiledPillowCanvas
+except ImportError:
+    pass
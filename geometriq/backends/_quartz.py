@@ -29,6 +29,17 @@ class CGRect(Structure):
     _fields_ = [("origin", CGPoint), ("size", CGSize)]
 
 
+class CGAffineTransform(Structure):
+    _fields_ = [
+        ("a", CGFloat),
+        ("b", CGFloat),
+        ("c", CGFloat),
+        ("d", CGFloat),
+        ("tx", CGFloat),
+        ("ty", CGFloat),
+    ]
+
+
 ##############
 # Constants
 #
@@ -111,6 +122,8 @@ quartz.CGContextAddRect.argtypes = [c_void_p, CGRect]  # Double check
 
 quartz.CGContextClosePath.argtypes = [c_void_p]
 
+quartz.CGContextConcatCTM.argtypes = [c_void_p, CGAffineTransform]
+
 quartz.CGContextConvertPointToDeviceSpace.restype = CGPoint
 quartz.CGContextConvertPointToDeviceSpace.argtypes = [c_void_p, CGPoint]
 
@@ -120,8 +133,12 @@ quartz.CGContextDrawPath.argtypes = [c_void_p, CGPathDrawingMode]
 
 quartz.CGContextMoveToPoint.argtypes = [c_void_p, CGFloat, CGFloat]
 
+quartz.CGContextRestoreGState.argtypes = [c_void_p]
+
 quartz.CGContextRotateCTM.argtypes = [c_void_p, CGFloat]
 
+quartz.CGContextSaveGState.argtypes = [c_void_p]
+
 quartz.CGContextScaleCTM.argtypes = [c_void_p, CGFloat, CGFloat]
 
 quartz.CGContextSetLineCap.argtypes = [c_void_p, CGLineCap]
@@ -171,6 +188,14 @@ quartz.CGImageCreateWithPNGDataProvider.argtypes = [
 
 quartz.CGImageDestinationAddImage.argtypes = [c_void_p, c_void_p, c_void_p]
 
+quartz.CGImageDestinationCreateWithData.restype = c_void_p
+quartz.CGImageDestinationCreateWithData.argtypes = [
+    c_void_p,
+    c_void_p,
+    c_size_t,
+    c_void_p,
+]
+
 quartz.CGImageDestinationCreateWithURL.restype = c_void_p
 quartz.CGImageDestinationCreateWithURL.argtypes = [
     c_void_p,
@@ -198,11 +223,14 @@ CGContextAddLineToPoint = quartz.CGContextAddLineToPoint
 CGContextAddQuadCurveToPoint = quartz.CGContextAddQuadCurveToPoint
 CGContextAddRect = quartz.CGContextAddRect
 CGContextClosePath = quartz.CGContextClosePath
+CGContextConcatCTM = quartz.CGContextConcatCTM
 CGContextConvertPointToToDeviceSpace = quartz.CGContextConvertPointToDeviceSpace
 CGContextDrawImage = quartz.CGContextDrawImage
 CGContextDrawPath = quartz.CGContextDrawPath
 CGContextMoveToPoint = quartz.CGContextMoveToPoint
+CGContextRestoreGState = quartz.CGContextRestoreGState
 CGContextRotateCTM = quartz.CGContextRotateCTM
+CGContextSaveGState = quartz.CGContextSaveGState
 CGContextScaleCTM = quartz.CGContextScaleCTM
 CGContextSetLineCap = quartz.CGContextSetLineCap
 CGContextSetLineJoin = quartz.CGContextSetLineJoin
@@ -217,6 +245,16 @@ CGImageGetHeight = quartz.CGImageGetHeight
 CGImageGetWidth = quartz.CGImageGetWidth
 
 
+def CGAffineTransformMake(a, b, c, d, tx, ty):
+    # an inline function in CGAffineTransform.h, so not exported
+    return CGAffineTransform(a, b, c, d, tx, ty)
+
+
+def CGImageDestinationCreateWithData(a, b, c, d):
+    # arg 2 needs to be nsstring
+    return quartz.CGImageDestinationCreateWithData(a, ns(b), c, d)
+
+
 def CGImageDestinationCreateWithURL(a, b, c, d):
     # arg 2 needs to be nsstring
     return quartz.CGImageDestinationCreateWithURL(a, ns(b), c, d)
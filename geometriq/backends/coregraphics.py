@@ -1,51 +1,38 @@
 from .quartz import *
 from ..canvas import Canvas, log_on_call
 
-from ..shapes import origin
-
-
-class ContextTranslator:
-    def __init__(self, context, translation_point):
-        self.context = context
-        self.translation_point = translation_point
-
-    def __enter__(self):
-        CGContextTranslateCTM(
-            self.context, self.translation_point.x, self.translation_point.y
-        )
-        return self.context
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        CGContextTranslateCTM(
-            self.context, -self.translation_point.x, -self.translation_point.y
-        )
-
-
-class ContextRotator:
-    def __init__(self, context, rotation):
+from ..shapes import (
+    as_coordinates,
+    circle_coordinates,
+    origin,
+    point_coordinates,
+    ragged_coordinates,
+    segment_coordinates,
+)
+from ..transform import Transform
+
+
+class ContextTransform:
+    """ Concatenates a Transform onto the CTM for the duration of a block,
+    inside a saved graphics state, so restoring it leaves no drift behind.
+    The identity leaves the context alone.
+    """
+
+    def __init__(self, context, transform):
         self.context = context
-        self.rotation = rotation
+        self.transform = transform
 
     def __enter__(self):
-        CGContextRotateCTM(self.context, self.rotation)
+        if not self.transform.is_identity:
+            CGContextSaveGState(self.context)
+            CGContextConcatCTM(
+                self.context, CGAffineTransformMake(*self.transform.as_tuple())
+            )
         return self.context
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        CGContextRotateCTM(self.context, -self.rotation)
-
-
-class ContextScalor:
-    def __init__(self, context, scale_x, scale_y=None):
-        self.context = context
-        self.scale_x = scale_x
-        self.scale_y = scale_y if scale_y is not None else scale_x
-
-    def __enter__(self):
-        CGContextScaleCTM(self.context, self.scale_x, self.scale_y)
-        return self.context
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        CGContextScaleCTM(self.context, 1 / self.scale_x, 1 / self.scale_y)
+        if not self.transform.is_identity:
+            CGContextRestoreGState(self.context)
 
 
 class CoreGraphicsCanvas(Canvas):
@@ -63,61 +50,44 @@ class CoreGraphicsCanvas(Canvas):
             kCGImageAlphaPremultipliedLast,
         )
 
-        self.debug = debug
-        self.operation_count = 0
+        if debug:
+            self.capture_frames()
 
-    @log_on_call
-    def set_line_join(self, join_style):
-        self.join_style = join_style
-        CGContextSetLineJoin(self.context, self.join_style)
+    def _apply_line_join(self, join_style):
+        CGContextSetLineJoin(self.context, join_style)
 
-    @log_on_call
-    def set_line_cap(self, cap_style):
-        self.cap_style = cap_style
-        CGContextSetLineCap(self.context, self.cap_style)
+    def _apply_line_cap(self, cap_style):
+        CGContextSetLineCap(self.context, cap_style)
 
-    @log_on_call
-    def set_miter_limit(self, miter_limit):
-        self.miter_limit = miter_limit
-        CGContextSetMiterLimit(self.context, self.miter_limit)
+    def _apply_miter_limit(self, miter_limit):
+        CGContextSetMiterLimit(self.context, miter_limit)
 
-    @log_on_call
-    def set_stroke_width(self, stroke_width):
-        self.stroke_width = stroke_width
-        CGContextSetLineWidth(self.context, self.stroke_width)
+    def _apply_stroke_width(self, stroke_width):
+        CGContextSetLineWidth(self.context, stroke_width)
 
-    @log_on_call
-    def set_stroke_color(self, stroke_color):
-        self.stroke_color = stroke_color
-        CGContextSetRGBStrokeColor(self.context, *self.stroke_color.rgba())
+    def _apply_stroke_color(self, stroke_color):
+        CGContextSetRGBStrokeColor(self.context, *stroke_color.rgba())
 
-    @log_on_call
-    def set_fill_color(self, fill_color):
-        self.fill_color = fill_color
-        CGContextSetRGBFillColor(self.context, *self.fill_color.rgba())
+    def _apply_fill_color(self, fill_color):
+        CGContextSetRGBFillColor(self.context, *fill_color.rgba())
 
     @log_on_call
     def fill_background(self):
         r = CGRect((0, 0), (self.width, self.height))
         CGContextAddRect(self.context, r)
         CGContextDrawPath(self.context, kCGPathFill)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        self._drew()
 
     @log_on_call
     def draw_line(
         self, from_point, to_point, at_point=origin, rotation=0, scale_x=1, scale_y=None
     ):
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    CGContextMoveToPoint(r_t_context, from_point.x, from_point.y)
-                    CGContextAddLineToPoint(r_t_context, to_point.x, to_point.y)
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextMoveToPoint(context, from_point.x, from_point.y)
+            CGContextAddLineToPoint(context, to_point.x, to_point.y)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
 
     @log_on_call
     def draw_curve(
@@ -130,36 +100,29 @@ class CoreGraphicsCanvas(Canvas):
         scale_x=1,
         scale_y=None,
     ):
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    CGContextMoveToPoint(r_t_context, points[0].x, points[0].y)
-                    point_pairs = list(zip(points[:-1], points[1:]))
-                    if control_points_cubic:
-                        control_point_pairs = list(
-                            zip(control_points, control_points_cubic)
-                        )
-                    else:
-                        control_point_pairs = list(
-                            zip(
-                                control_points,
-                                [None for x in range(len(control_points))],
-                            )
-                        )
-                    for i, (start, end) in enumerate(point_pairs):
-                        cp1, cp2 = control_point_pairs[i]
-                        if cp2:
-                            CGContextAddCurveToPoint(
-                                r_t_context, cp1.x, cp1.y, cp2.x, cp2.y, end.x, end.y
-                            )
-                        else:
-                            CGContextAddQuadCurveToPoint(
-                                r_t_context, cp1.x, cp1.y, end.x, end.y
-                            )
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextMoveToPoint(context, points[0].x, points[0].y)
+            point_pairs = list(zip(points[:-1], points[1:]))
+            if control_points_cubic:
+                control_point_pairs = list(zip(control_points, control_points_cubic))
+            else:
+                control_point_pairs = list(
+                    zip(
+                        control_points,
+                        [None for x in range(len(control_points))],
+                    )
+                )
+            for i, (start, end) in enumerate(point_pairs):
+                cp1, cp2 = control_point_pairs[i]
+                if cp2:
+                    CGContextAddCurveToPoint(
+                        context, cp1.x, cp1.y, cp2.x, cp2.y, end.x, end.y
+                    )
+                else:
+                    CGContextAddQuadCurveToPoint(context, cp1.x, cp1.y, end.x, end.y)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
 
     @log_on_call
     def draw_arc(
@@ -172,39 +135,86 @@ class CoreGraphicsCanvas(Canvas):
         scale_x=1,
         scale_y=None,
     ):
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    CGContextAddArc(
-                        r_t_context, center.x, center.y, radius, 0, angle, 0
-                    )
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextAddArc(context, center.x, center.y, radius, 0, angle, 0)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
 
     @log_on_call
     def draw_polygon(
         self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
     ):
-        drawn_points = list(points)
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    starting_point = drawn_points.pop(0)
-                    CGContextMoveToPoint(
-                        r_t_context, starting_point.x, starting_point.y
-                    )
-                    for next_point in drawn_points:
-                        CGContextAddLineToPoint(r_t_context, next_point.x, next_point.y)
-                    CGContextAddLineToPoint(
-                        r_t_context, starting_point.x, starting_point.y
-                    )
-                    CGContextClosePath(r_t_context)
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        drawn_points = point_coordinates(points)
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            start_x, start_y = drawn_points[0]
+            CGContextMoveToPoint(context, start_x, start_y)
+            for next_x, next_y in drawn_points[1:]:
+                CGContextAddLineToPoint(context, next_x, next_y)
+            CGContextAddLineToPoint(context, start_x, start_y)
+            CGContextClosePath(context)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
+
+    @log_on_call
+    def draw_polygons(
+        self, polygons, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        coordinates, counts = ragged_coordinates(polygons)
+        coordinates = coordinates.tolist()
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            start = 0
+            for count in counts.tolist():
+                if count:
+                    polygon = coordinates[start : start + count]
+                    CGContextMoveToPoint(context, *polygon[0])
+                    for next_x, next_y in polygon[1:]:
+                        CGContextAddLineToPoint(context, next_x, next_y)
+                    CGContextClosePath(context)
+                start += count
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
+
+    @log_on_call
+    def draw_lines(self, lines, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            for x0, y0, x1, y1 in segment_coordinates(lines).tolist():
+                CGContextMoveToPoint(context, x0, y0)
+                CGContextAddLineToPoint(context, x1, y1)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
+
+    @log_on_call
+    def draw_polyline(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        drawn_points = as_coordinates(points).tolist()
+        if not drawn_points:
+            return
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextMoveToPoint(context, *drawn_points[0])
+            for next_x, next_y in drawn_points[1:]:
+                CGContextAddLineToPoint(context, next_x, next_y)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
+
+    @log_on_call
+    def draw_circles(
+        self, circles, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            for x, y, radius in circle_coordinates(circles).tolist():
+                CGContextAddEllipseInRect(
+                    context,
+                    CGRect((x - radius, y - radius), (radius * 2, radius * 2)),
+                )
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
 
     @log_on_call
     def draw_polycurves(
@@ -216,20 +226,17 @@ class CoreGraphicsCanvas(Canvas):
     def draw_circle(
         self, radius, center, at_point=origin, rotation=0, scale_x=1, scale_y=None
     ):
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    CGContextAddEllipseInRect(
-                        r_t_context,
-                        CGRect(
-                            (center.x - radius, center.y - radius),
-                            (radius * 2, radius * 2),
-                        ),
-                    )
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextAddEllipseInRect(
+                context,
+                CGRect(
+                    (center.x - radius, center.y - radius),
+                    (radius * 2, radius * 2),
+                ),
+            )
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
 
     @log_on_call
     def draw_circular_segment(
@@ -242,26 +249,29 @@ class CoreGraphicsCanvas(Canvas):
         scale_x=1,
         scale_y=None,
     ):
-        with ContextScalor(self.context, scale_x, scale_y) as s_context:
-            with ContextTranslator(s_context, at_point) as t_context:
-                with ContextRotator(t_context, rotation) as r_t_context:
-                    CGContextMoveToPoint(r_t_context, center.x, center.y)
-                    CGContextAddLineToPoint(r_t_context, center.x + radius, center.y)
-                    CGContextAddArc(
-                        r_t_context, center.x, center.y, radius, 0, angle, 0
-                    )
-                    CGContextAddLineToPoint(r_t_context, center.x, center.y)
-                    CGContextDrawPath(r_t_context, kCGPathFillStroke)
-        if self.debug:
-            self.save()
-            self.operation_count += 1
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        with ContextTransform(self.context, placement) as context:
+            CGContextMoveToPoint(context, center.x, center.y)
+            CGContextAddLineToPoint(context, center.x + radius, center.y)
+            CGContextAddArc(context, center.x, center.y, radius, 0, angle, 0)
+            CGContextAddLineToPoint(context, center.x, center.y)
+            CGContextDrawPath(context, kCGPathFillStroke)
+        self._drew()
+
+    def frame_snapshot(self):
+        return CGBitmapContextCreateImage(self.context)
+
+    def encode_frame(self, snapshot):
+        data = NSMutableData.data()
+        dest = CGImageDestinationCreateWithData(data, "public.png", 1, None)
+        CGImageDestinationAddImage(dest, snapshot, None)
+        CGImageDestinationFinalize(dest)
+        return bytes(data)
 
     @log_on_call
     def save(self):
         image = CGBitmapContextCreateImage(self.context)
-        filename = "{}{}.png".format(
-            self.name, "-{:05}".format(self.operation_count) if self.debug else ""
-        )
+        filename = "{}.png".format(self.name)
         url = NSURL.fileURLWithPath_(filename)
         dest = CGImageDestinationCreateWithURL(url, "public.png", 1, None)
         CGImageDestinationAddImage(dest, image, None)
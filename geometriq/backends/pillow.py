@@ -1,50 +1,265 @@
 from datetime import datetime
+import io
 
 from PIL import Image, ImageDraw
+import numpy as np
 
-from ..canvas import Canvas
-from ..shapes import Point
+from ..bezier import cubic_segments, flattening_cache
+from ..canvas import Canvas, log_on_call
+from ..shapes import (
+    Point,
+    as_coordinates,
+    circle_coordinates,
+    origin,
+    point_coordinates,
+    ragged_coordinates,
+    segment_coordinates,
+)
+from ..transform import Transform
 
 
 class PillowCanvas(Canvas):
-    def __init__(self, name, width, height):
-        super(PillowCanvas, self).__init__(name, width, height)
+    """ A canvas drawing into a Pillow image at twice the requested size,
+    downsampled on save.
+
+    Pillow has no curves, so Bézier paths are flattened to polylines that
+    stay within `flatness` device pixels of the true curve.
+
+    A canvas can draw just one tile of the image, given as the left, top,
+    right and bottom device pixels it covers. Device coordinates are rounded
+    before the tile's offset is taken off, so that full-width tiles stitched
+    together match the whole image drawn at once pixel for pixel.
+    """
+
+    flatness = 0.25
+
+    def __init__(self, name, width, height, seed, tile=None):
+        super(PillowCanvas, self).__init__(name, width, height, seed)
 
         self.width = int(round(width * 2))
         self.height = int(round(height * 2))
 
         self.original_width = int(round(width))
         self.original_height = int(round(height))
+        # Canvas coordinates, y up, to supersampled image pixels, y down.
+        self.device_transform = Transform(2, 0, 0, -2, 0, self.original_height * 2)
+
+        left, top, right, bottom = tile or (0, 0, self.width, self.height)
+        self.device_origin = np.array([left, top])
+        self.viewport = (
+            left / 2,
+            self.original_height - bottom / 2,
+            right / 2,
+            self.original_height - top / 2,
+        )
 
-        self.image = Image.new("RGBA", (self.width, self.height), None)
+        self.image = Image.new("RGBA", (right - left, bottom - top), None)
         self.drawer = ImageDraw.Draw(self.image, mode="RGBA")
+        self.device_stroke_width = None
         self.current_point = None
 
     def _translate_point(self, point):
+        left, top = self.device_origin.tolist()
         return Point(
-            int(round(point.x * 2)), int(round((self.original_height - point.y) * 2))
+            int(round(point.x * 2)) - left,
+            int(round((self.original_height - point.y) * 2)) - top,
         )
 
+    def _device_coordinates(
+        self, coordinates, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Place an (n, 2) array of coordinates the way the CoreGraphics
+        backend's CTM would, then map it into image pixels.
+        """
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        return (self.device_transform @ placement).apply(coordinates)
+
     def center(self):
         return Point(
             int(round(self.original_width / 2)), int(round(self.original_height / 2))
         )
 
-    def set_stroke_width(self, stroke_width):
-        self.stroke_width = int(round(stroke_width * 2))
-
-    def set_stroke_color(self, stroke_color):
-        self.stroke_color = stroke_color
-
-    def set_fill_color(self, fill_color):
-        self.fill_color = fill_color
+    def _apply_stroke_width(self, stroke_width):
+        self.device_stroke_width = int(round(stroke_width * 2))
 
+    @log_on_call
     def fill_background(self):
-        p1 = self._translate_point(Point(0, 0))
-        p2 = self._translate_point(Point(self.original_width, self.original_height))
         self.drawer.rectangle(
-            [(p1.x, p1.y), (p2.x, p2.y)], fill=self.fill_color.int_rgba()
+            [(0, 0), self.image.size], fill=self.fill_color.int_rgba()
+        )
+        self._drew()
+
+    def _paint(self, device, closed=True):
+        """ Fill and stroke a device-space path with the current colors, as
+        CoreGraphics' fill-and-stroke does: the fill always closes the path,
+        the stroke only when closed is true.
+        """
+        device = device.round().astype(int) - self.device_origin
+        coords = [tuple(xy) for xy in device.tolist()]
+        if len(coords) < 2:
+            return
+        if len(coords) > 2 and self.fill_color is not None and self.fill_color.a > 0:
+            self.drawer.polygon(coords, fill=self.fill_color.int_rgba())
+        if self.stroke_color is not None and self.stroke_color.a > 0:
+            if closed:
+                coords.append(coords[0])
+            self.drawer.line(
+                coords,
+                fill=self.stroke_color.int_rgba(),
+                width=self.device_stroke_width or 1,
+                joint="curve",
+            )
+
+    def _device_paths(self, coordinates, counts, *placement):
+        """ Place a batch of paths, given as ragged coordinates and counts, in
+        one go. Returns each path that can reach the image as a list of
+        integer pixel pairs.
+        """
+        device = self._device_coordinates(coordinates, *placement)
+        device = device.round().astype(int) - self.device_origin
+        starts = np.cumsum(counts) - counts
+        starts, counts = starts[counts > 0], counts[counts > 0]
+        if not len(counts):
+            return []
+
+        margin = self.device_stroke_width or 1
+        width, height = self.image.size
+        lows = np.minimum.reduceat(device, starts)
+        highs = np.maximum.reduceat(device, starts)
+        visible = (
+            (highs[:, 0] >= -margin)
+            & (lows[:, 0] <= width + margin)
+            & (highs[:, 1] >= -margin)
+            & (lows[:, 1] <= height + margin)
+        )
+        device = device.tolist()
+        return [
+            device[start : start + count]
+            for start, count in zip(
+                starts[visible].tolist(), counts[visible].tolist()
+            )
+        ]
+
+    def _paint_batch(self, paths, closed=True):
+        """ Fill every path of a batch, then stroke them all, as CoreGraphics
+        does when the batch is one path.
+        """
+        if self.fill_color is not None and self.fill_color.a > 0:
+            fill = self.fill_color.int_rgba()
+            for path in paths:
+                if len(path) > 2:
+                    self.drawer.polygon([tuple(xy) for xy in path], fill=fill)
+        if self.stroke_color is not None and self.stroke_color.a > 0:
+            stroke = self.stroke_color.int_rgba()
+            for path in paths:
+                if len(path) > 1:
+                    coords = [tuple(xy) for xy in path]
+                    if closed:
+                        coords.append(coords[0])
+                    self.drawer.line(
+                        coords,
+                        fill=stroke,
+                        width=self.device_stroke_width or 1,
+                        joint="curve",
+                    )
+
+    @log_on_call
+    def draw_polygons(
+        self, polygons, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        coordinates, counts = ragged_coordinates(polygons)
+        self._paint_batch(
+            self._device_paths(
+                coordinates, counts, at_point, rotation, scale_x, scale_y
+            )
+        )
+        self._drew()
+
+    @log_on_call
+    def draw_lines(self, lines, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        segments = segment_coordinates(lines)
+        self._paint_batch(
+            self._device_paths(
+                segments.reshape(-1, 2),
+                np.full(len(segments), 2),
+                at_point,
+                rotation,
+                scale_x,
+                scale_y,
+            ),
+            closed=False,
+        )
+        self._drew()
+
+    @log_on_call
+    def draw_polyline(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        self._paint(
+            self._device_coordinates(
+                as_coordinates(points), at_point, rotation, scale_x, scale_y
+            ),
+            closed=False,
+        )
+        self._drew()
+
+    @log_on_call
+    def draw_circles(
+        self, circles, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        circles = circle_coordinates(circles)
+        scale_y = scale_y if scale_y is not None else scale_x
+        centers = self._device_coordinates(
+            circles[:, :2], at_point, rotation, scale_x, scale_y
+        )
+        radii = np.abs(circles[:, 2:] * 2) * np.abs([scale_x, scale_y])
+        boxes = np.hstack((centers - radii, centers + radii)).round().astype(int)
+        boxes -= np.tile(self.device_origin, 2)
+
+        margin = self.device_stroke_width or 1
+        width, height = self.image.size
+        boxes = boxes[
+            (boxes[:, 2] >= -margin)
+            & (boxes[:, 0] <= width + margin)
+            & (boxes[:, 3] >= -margin)
+            & (boxes[:, 1] <= height + margin)
+        ].tolist()
+
+        if self.fill_color is not None:
+            fill = self.fill_color.int_rgba()
+            for box in boxes:
+                self.drawer.ellipse(box, fill=fill)
+        if self.stroke_color is not None:
+            stroke = self.stroke_color.int_rgba()
+            for box in boxes:
+                self.drawer.ellipse(
+                    box, outline=stroke, width=self.device_stroke_width or 1
+                )
+        self._drew()
+
+    @log_on_call
+    def draw_line(
+        self, from_point, to_point, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        coordinates = np.array(
+            [(from_point.x, from_point.y), (to_point.x, to_point.y)], dtype=float
+        )
+        self._paint(
+            self._device_coordinates(coordinates, at_point, rotation, scale_x, scale_y),
+            closed=False,
+        )
+        self._drew()
+
+    @log_on_call
+    def draw_polygon(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        self._paint(
+            self._device_coordinates(
+                as_coordinates(points), at_point, rotation, scale_x, scale_y
+            )
         )
+        self._drew()
 
     def move_to(self, point):
         self.current_point = self._translate_point(point)
@@ -57,33 +272,84 @@ class PillowCanvas(Canvas):
                 (translated_point.x, translated_point.y),
             ],
             fill=self.stroke_color.int_rgba(),
-            width=self.stroke_width,
+            width=self.device_stroke_width,
         )
         self.current_point = translated_point
 
     def polygon(self, points):
-        t_points = [self._translate_point(p) for p in points]
-        p_coords = [(p.x, p.y) for p in t_points]
-        self.drawer.polygon(
-            p_coords,
-            fill=self.fill_color.int_rgba(),
-            outline=self.stroke_color.int_rgba(),
+        self.draw_polygon(points)
+
+    @log_on_call
+    def draw_curve(
+        self,
+        points,
+        control_points,
+        control_points_cubic=None,
+        at_point=origin,
+        rotation=0,
+        scale_x=1,
+        scale_y=None,
+    ):
+        cubic = None
+        if control_points_cubic:
+            nan = float("nan")
+            cubic = [
+                (nan, nan) if p is None else (p.x, p.y) for p in control_points_cubic
+            ]
+        segments = cubic_segments(
+            as_coordinates(points), point_coordinates(control_points), cubic
         )
 
-    def draw_circle(self, center, radius):
-        p1 = self._translate_point(Point(center.x - radius, center.y - radius))
-        p2 = self._translate_point(Point(center.x + radius, center.y + radius))
-        self.drawer.fill_ellipse(
-            [(p1.x, p1.y), (p2.x, p2.y)],
-            outline=self.stroke_color.int_rgba(),
-            fill=self.fill_color.int_rgba(),
+        scale_y = scale_y if scale_y is not None else scale_x
+        tolerance = self.flatness / (2 * max(abs(scale_x), abs(scale_y)))
+        polyline = flattening_cache.flatten(segments, tolerance)
+
+        self._paint(
+            self._device_coordinates(polyline, at_point, rotation, scale_x, scale_y),
+            closed=False,
         )
+        self._drew()
 
-    def save(self):
-        filename = "{}{}.png".format(
-            self.name, datetime.now().strftime("%Y-%m-%d-%H:%M:%S")
+    @log_on_call
+    def draw_circle(
+        self, radius, center, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        scale_y = scale_y if scale_y is not None else scale_x
+        (x, y), = self._device_coordinates(
+            np.array([(center.x, center.y)]), at_point, rotation, scale_x, scale_y
+        ).tolist()
+        rx, ry = abs(radius * scale_x * 2), abs(radius * scale_y * 2)
+        box = np.array([(x - rx, y - ry), (x + rx, y + ry)]).round().astype(int)
+        self.drawer.ellipse(
+            [tuple(xy) for xy in (box - self.device_origin).tolist()],
+            fill=self.fill_color.int_rgba() if self.fill_color is not None else None,
+            outline=(
+                self.stroke_color.int_rgba() if self.stroke_color is not None else None
+            ),
+            width=self.device_stroke_width or 1,
         )
-        self.image = self.image.resize(
-            (self.original_width, self.original_height), resample=Image.LANCZOS
+        self._drew()
+
+    def frame_snapshot(self):
+        return self.image.copy()
+
+    def encode_frame(self, snapshot):
+        png = io.BytesIO()
+        snapshot.save(png, "PNG")
+        return png.getvalue()
+
+    @log_on_call
+    def save(self):
+        self.image = save_supersampled(
+            self.name, self.image, self.original_width, self.original_height
         )
-        self.image.save(filename, "PNG")
+
+
+def save_supersampled(name, image, width, height):
+    """ Downsample a twice-size image to width by height and save it as a
+    timestamped PNG. Returns the downsampled image.
+    """
+    filename = "{}{}.png".format(name, datetime.now().strftime("%Y-%m-%d-%H:%M:%S"))
+    image = image.resize((width, height), resample=Image.LANCZOS)
+    image.save(filename, "PNG")
+    return image
@@ -1,6 +1,7 @@
 import canvas as pythonista_canvas
 
 from ..canvas import Canvas
+from ..shapes import point_coordinates
 
 
 class PythonistaCanvas(Canvas):
@@ -9,17 +10,14 @@ class PythonistaCanvas(Canvas):
         self.canvas = pythonista_canvas
         self.current_point = None
 
-    def set_stroke_width(self, stroke_width):
-        self.stroke_width = stroke_width
-        self.canvas.set_line_width(self.stroke_width)
+    def _apply_stroke_width(self, stroke_width):
+        self.canvas.set_line_width(stroke_width)
 
-    def set_stroke_color(self, stroke_color):
-        self.stroke_color = stroke_color
-        self.canvas.set_stroke_color(*self.stroke_color.rgba())
+    def _apply_stroke_color(self, stroke_color):
+        self.canvas.set_stroke_color(*stroke_color.rgba())
 
-    def set_fill_color(self, fill_color):
-        self.fill_color = fill_color
-        self.canvas.set_fill_color(*self.fill_color.rgba())
+    def _apply_fill_color(self, fill_color):
+        self.canvas.set_fill_color(*fill_color.rgba())
 
     def fill_background(self):
         self.begin_path()
@@ -45,11 +43,12 @@ class PythonistaCanvas(Canvas):
         )
 
     def polygon(self, points):
+        coords = point_coordinates(points)
         self.begin_path()
-        self.move_to(points[0])
-        for point in points[1:]:
-            self.draw_line_to(point)
-            self.move_to(point)
+        self.canvas.move_to(*coords[0])
+        for (from_x, from_y), (to_x, to_y) in zip(coords[:-1], coords[1:]):
+            self.canvas.draw_line(from_x, from_y, to_x, to_y)
+            self.canvas.move_to(to_x, to_y)
         self.end_path()
 
     def draw_circle(self, center, radius):
@@ -0,0 +1,128 @@
+from math import ceil
+import multiprocessing
+
+from PIL import Image
+import numpy as np
+
+from ..display_list import RecordingCanvas
+from .pillow import PillowCanvas, save_supersampled
+
+
+"""
+Tile-parallel rendering with the Pillow backend.
+
+The drawing is recorded into a display list once, and the supersampled image
+split into tiles, each a full-width band of rows. Worker processes each
+replay the part of the list that reaches their tile into a PillowCanvas
+drawing only that tile, and the tiles are stitched back together before
+downsampling, so the result is the image a single PillowCanvas would have
+drawn.
+"""
+
+
+_worker = {}
+
+
+class _TileCanvas(PillowCanvas):
+    log_mode = None
+
+
+def _start_worker(display_list, name, width, height, seed, margin):
+    _worker.update(
+        display_list=display_list,
+        arguments=(name, width, height, seed),
+        size=(int(round(width * 2)), int(round(height * 2))),
+        margin=margin,
+    )
+
+
+def _render_tile(tile):
+    # Pillow draws shapes cut by the edge of its image a little differently,
+    # so each tile is drawn with a margin wider than any stroke, except along
+    # the edges of the whole image, and then cropped.
+    left, top, right, bottom = tile
+    width, height = _worker["size"]
+    margin = _worker["margin"]
+    padded = (
+        max(left - margin, 0),
+        max(top - margin, 0),
+        min(right + margin, width),
+        min(bottom + margin, height),
+    )
+    canvas = _TileCanvas(*_worker["arguments"], tile=padded)
+
+    # Pad the viewport by a pixel, for strokes rounded out onto it.
+    view_left, view_bottom, view_right, view_top = canvas.viewport
+    viewport = (view_left - 1, view_bottom - 1, view_right + 1, view_top + 1)
+    _worker["display_list"].culled(viewport).replay(canvas)
+
+    crop = (left - padded[0], top - padded[1], right - padded[0], bottom - padded[1])
+    return tile, canvas.image.crop(crop)
+
+
+def tile_bands(width, height, tiles):
+    """ Split a width by height image into tiles full-width bands, as
+    rectangles of left, top, right, bottom pixels.
+
+    Pillow fills polygons a row at a time, adding fractional steps along each
+    edge to its starting x, so moving a polygon sideways can round one of its
+    edge pixels the other way. Moving it up or down can't, so bands drawn
+    apart match the whole image drawn at once where side by side tiles might
+    not.
+    """
+    ys = np.linspace(0, height, tiles + 1).round().astype(int).tolist()
+    return [(0, top, width, bottom) for top, bottom in zip(ys, ys[1:]) if bottom > top]
+
+
+def render_tiles(display_list, name, width, height, seed, tiles=16, processes=None):
+    """ Rasterize a display list with PillowCanvas in tiles bands across a
+    pool of processes, by default one per core. Returns the
+    stitched image at the canvas's supersampled size.
+    """
+    image = Image.new("RGBA", (int(round(width * 2)), int(round(height * 2))), None)
+    grid = tile_bands(image.width, image.height, tiles)
+    margin = int(ceil(display_list.max_stroke_width * 2)) + 2
+    arguments = (display_list, name, width, height, seed, margin)
+
+    if processes == 1 or len(grid) == 1:
+        _start_worker(*arguments)
+        for (left, top, _, _), tile in map(_render_tile, grid):
+            image.paste(tile, (left, top))
+        return image
+
+    with multiprocessing.Pool(processes, _start_worker, arguments) as pool:
+        for (left, top, _, _), tile in pool.imap_unordered(_render_tile, grid):
+            image.paste(tile, (left, top))
+    return image
+
+
+class TiledPillowCanvas(RecordingCanvas):
+    """ A canvas that records its drawing and, on save, renders it with
+    PillowCanvas in `tiles` bands across `processes` worker processes (by
+    default one per core).
+    """
+
+    tiles = 16
+    processes = None
+
+    def render(self):
+        """ The drawing so far, as the supersampled image PillowCanvas would
+        have drawn.
+        """
+        return render_tiles(
+            self.display_list,
+            self.name,
+            self.width,
+            self.height,
+            self.seed,
+            self.tiles,
+            self.processes,
+        )
+
+    def save(self):
+        self.image = save_supersampled(
+            self.name,
+            self.render(),
+            int(round(self.width)),
+            int(round(self.height)),
+        )
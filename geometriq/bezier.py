@@ -0,0 +1,243 @@
+from collections import OrderedDict
+from math import floor, log2
+
+import numpy as np
+
+
+"""
+Array math for paths of Bézier segments.
+
+Systems and knot sequences run along their first axis and may carry any
+number of trailing batch axes, so one call handles a single spline or every
+streamline in a flow field at once.
+"""
+
+
+def solve_tridiagonal(lower, diagonal, upper, rhs):
+    """ Solve tridiagonal systems with the Thomas algorithm.
+
+    lower, diagonal and upper hold the n coefficients below, on and above the
+    diagonal (lower[0] and upper[-1] are ignored); they are shared by every
+    system in the batch. rhs is shaped (n, ...), and the solution has the same
+    shape.
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    diagonal = np.array(diagonal, dtype=float)
+    rhs = np.array(rhs, dtype=float)
+    count = len(diagonal)
+
+    for i in range(1, count):
+        m = lower[i] / diagonal[i - 1]
+        diagonal[i] -= m * upper[i - 1]
+        rhs[i] -= m * rhs[i - 1]
+
+    rhs[count - 1] /= diagonal[count - 1]
+    for i in range(count - 2, -1, -1):
+        rhs[i] = (rhs[i] - upper[i] * rhs[i + 1]) / diagonal[i]
+
+    return rhs
+
+
+def solve_cyclic_tridiagonal(lower, diagonal, upper, rhs):
+    """ Solve cyclic tridiagonal systems, where lower[0] couples the first row
+    to the last unknown and upper[-1] the last row to the first, using the
+    Sherman-Morrison formula over two Thomas solves.
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    diagonal = np.array(diagonal, dtype=float)
+    rhs = np.asarray(rhs, dtype=float)
+    count = len(diagonal)
+
+    if count < 3:
+        matrix = np.diag(diagonal)
+        for i in range(count):
+            matrix[i, (i - 1) % count] += lower[i]
+            matrix[i, (i + 1) % count] += upper[i]
+        solution = np.linalg.solve(matrix, rhs.reshape(count, -1))
+        return solution.reshape(rhs.shape)
+
+    alpha, beta = upper[-1], lower[0]
+    gamma = -diagonal[0]
+    diagonal[0] -= gamma
+    diagonal[-1] -= alpha * beta / gamma
+
+    y = solve_tridiagonal(lower, diagonal, upper, rhs)
+    u = np.zeros(count)
+    u[0], u[-1] = gamma, alpha
+    z = solve_tridiagonal(lower, diagonal, upper, u)
+
+    factor = (y[0] + beta * y[-1] / gamma) / (1 + z[0] + beta * z[-1] / gamma)
+    return y - z.reshape((count,) + (1,) * (y.ndim - 1)) * factor
+
+
+def spline_control_points(knots, closed=False):
+    """ Compute the control points of the smooth cubic spline through knots.
+
+    knots is shaped (n, ..., 2): n knots along the first axis, then any batch
+    axes, then x and y. Returns the first and second control point arrays, one
+    row per segment: n - 1 segments for an open spline, n for a closed one,
+    whose last segment runs back to the first knot.
+    """
+    knots = np.asarray(knots, dtype=float)
+    count = len(knots)
+
+    if closed:
+        if count < 2:
+            return knots[:0].copy(), knots[:0].copy()
+        following = np.roll(knots, -1, axis=0)
+        ones = np.ones(count)
+        first = solve_cyclic_tridiagonal(
+            ones, 4 * ones, ones, 4 * knots + 2 * following
+        )
+        second = 2 * following - np.roll(first, -1, axis=0)
+        return first, second
+
+    segments = count - 1
+    if segments < 1:
+        return knots[:0].copy(), knots[:0].copy()
+
+    if segments == 1:
+        first = (2 * knots[:1] + knots[1:]) / 3
+        return first, 2 * first - knots[:1]
+
+    lower = np.ones(segments)
+    diagonal = np.full(segments, 4.0)
+    upper = np.ones(segments)
+    diagonal[0], upper[0] = 2, 1
+    lower[-1], diagonal[-1] = 2, 7
+
+    rhs = 4 * knots[:-1] + 2 * knots[1:]
+    rhs[0] = knots[0] + 2 * knots[1]
+    rhs[-1] = 8 * knots[-2] + knots[-1]
+
+    first = solve_tridiagonal(lower, diagonal, upper, rhs)
+    second = np.empty_like(first)
+    second[:-1] = 2 * knots[1:-1] - first[1:]
+    second[-1] = (knots[-1] + first[-1]) / 2
+    return first, second
+
+
+def cubic_segments(knots, first, second=None):
+    """ Assemble an (n - 1, 4, 2) array of cubic segments from n knots and
+    their control points. Segments without a second control point (second is
+    None, or its row is NaN) are quadratic and get degree-elevated.
+    """
+    knots = np.asarray(knots, dtype=float).reshape(-1, 2)
+    count = max(len(knots) - 1, 0)
+    first = np.asarray(first, dtype=float).reshape(-1, 2)[:count]
+
+    segments = np.empty((count, 4, 2))
+    segments[:, 0] = knots[:-1]
+    segments[:, 3] = knots[1:]
+    segments[:, 1] = first
+    segments[:, 2] = first
+
+    quadratic = np.ones(count, dtype=bool)
+    if second is not None:
+        second = np.asarray(second, dtype=float).reshape(-1, 2)[:count]
+        quadratic = np.isnan(second).any(axis=1)
+        segments[~quadratic, 2] = second[~quadratic]
+
+    starts, ends = knots[:-1][quadratic], knots[1:][quadratic]
+    control = first[quadratic]
+    segments[quadratic, 1] = starts + 2 * (control - starts) / 3
+    segments[quadratic, 2] = ends + 2 * (control - ends) / 3
+    return segments
+
+
+def evaluate_segments(segments, t):
+    """ Evaluate a path of cubic segments at parameters t, where segment n
+    covers n <= t <= n + 1. Returns an array of x, y pairs shaped like t plus
+    a trailing axis of 2.
+    """
+    t = np.asarray(t, dtype=float)
+    count = len(segments)
+    index = np.clip(np.floor(t), 0, max(count - 1, 0)).astype(int)
+    u = (t - index)[..., None]
+    v = 1 - u
+
+    p0, p1, p2, p3 = (segments[index, k] for k in range(4))
+    return v * v * v * p0 + 3 * v * v * u * p1 + 3 * v * u * u * p2 + u * u * u * p3
+
+
+def arc_length_table(segments, samples=32):
+    """ Sample each segment samples times and return the parameters and the
+    cumulative chord length at each sample, for arc length lookups.
+    """
+    parameters = np.linspace(0, len(segments), len(segments) * samples + 1)
+    positions = evaluate_segments(segments, parameters)
+    steps = np.hypot(*np.diff(positions, axis=0).T)
+    return parameters, np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def parameters_at_lengths(table, lengths):
+    """ Invert an arc_length_table: the parameter at each arc length. """
+    parameters, cumulative = table
+    return np.interp(lengths, cumulative, parameters)
+
+
+def flattening_counts(segments, tolerance):
+    """ The number of line segments each cubic needs so the polyline stays
+    within tolerance of the curve (Wang's bound).
+    """
+    p0, p1, p2, p3 = (segments[:, k] for k in range(4))
+    bend = np.maximum(
+        np.hypot(*(p0 - 2 * p1 + p2).T), np.hypot(*(p1 - 2 * p2 + p3).T)
+    )
+    return np.maximum(np.ceil(np.sqrt(0.75 * bend / tolerance)), 1).astype(int)
+
+
+def flatten_segments(segments, tolerance):
+    """ Approximate a path of cubic segments by an (n, 2) polyline whose
+    distance from the curve never exceeds tolerance.
+    """
+    if not len(segments):
+        return np.empty((0, 2))
+
+    counts = flattening_counts(segments, tolerance)
+    starts = np.repeat(np.arange(len(segments)), counts)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    parameters = np.append(starts + steps / np.repeat(counts, counts), len(segments))
+    return evaluate_segments(segments, parameters)
+
+
+class FlatteningCache(object):
+    """ A bounded least-recently-used cache of flattened paths.
+
+    Entries are keyed on the segment coordinates and on the tolerance rounded
+    down to a power of two, so the same geometry drawn again at a similar
+    scale, by the same or another canvas, reuses its polyline.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def flatten(self, segments, tolerance):
+        segments = np.ascontiguousarray(segments, dtype=float)
+        tolerance = 2.0 ** floor(log2(tolerance))
+        key = (segments.tobytes(), tolerance)
+
+        try:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        except KeyError:
+            pass
+
+        polyline = flatten_segments(segments, tolerance)
+        polyline.setflags(write=False)
+        self._entries[key] = polyline
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return polyline
+
+
+flattening_cache = FlatteningCache()
@@ -1,65 +1,219 @@
+import atexit
+from functools import wraps
 from math import sqrt
+import queue
 import random
+import threading
 
+import numpy as np
 import opensimplex
 
-from .shapes import Point, origin
+from .clipping import clip_polygon, clip_polyline
+from .debug import FrameCapture
+from .shapes import (
+    Point,
+    PointArray,
+    as_coordinates,
+    circle_coordinates,
+    origin,
+    ragged_coordinates,
+    segment_coordinates,
+)
+from .transform import Transform
+
+
+def format_call(name, args, kw):
+    """ Format a canvas call as the line of Python that would repeat it. """
+    args_join = ", ".join([repr(x) for x in args])
+    kw_join = ", ".join(["{}={}".format(repr(k), repr(v)) for (k, v) in kw.items()])
+    return "canvas.{}({}{})".format(
+        name, args_join, ", {}".format(kw_join) if kw_join else ""
+    )
+
+
+def placed_bounds(bounds, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+    """ Box bounds again after placing them as the draw methods place a
+    shape: rotated, moved to at_point, then scaled. The corners are
+    transformed, so under rotation the result is conservative.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+    corners = ((min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y))
+    placed = [placement.apply_point(Point(x, y)) for x, y in corners]
+    xs, ys = [p.x for p in placed], [p.y for p in placed]
+    return min(xs), min(ys), max(xs), max(ys)
 
 
 def log_on_call(f):
-    def log_and_call(*args, **kw):
-        args_join = ", ".join([repr(x) for x in args[1:]])
-        kw_join = ", ".join(["{}={}".format(repr(k), repr(v)) for (k, v) in kw.items()])
+    """ Log each call to a canvas method. Logged methods called from inside
+    one, such as the draws a batch falls back on, aren't logged again.
+    """
+    name = f.__name__
+
+    @wraps(f)
+    def log_and_call(self, *args, **kw):
+        sink = self.log_sink
+        if sink is None:
+            return f(self, *args, **kw)
+        sink.record(name, args, kw)
+        self.log_sink = None
+        try:
+            return f(self, *args, **kw)
+        finally:
+            self.log_sink = sink
 
-        args[0].log(
-            "canvas.{}({}{})".format(
-                f.__name__, args_join, ", {}".format(kw_join) if kw_join else ""
-            )
-        )
+    return log_and_call
 
-        return f(*args, **kw)
 
-    return log_and_call
+def state_setter(attribute):
+    """ Make a set_* method skip values equal to the canvas attribute it
+    sets, so neither the log nor the backend sees them. The rest are logged
+    and applied as usual.
+    """
 
+    def decorator(f):
+        logged = log_on_call(f)
 
-class StrokeWidthContext:
-    def __init__(self, canvas, stroke_width):
+        @wraps(f)
+        def set_if_changed(self, value):
+            current = getattr(self, attribute)
+            if value is current or value == current:
+                return
+            return logged(self, value)
+
+        return set_if_changed
+
+    return decorator
+
+
+class LogSink(object):
+    """ Collects a canvas's calls and appends them to its log file as lines
+    of Python, in batches of batch_size lines rather than one file open per
+    call. Whatever is left is written on flush, close or interpreter exit.
+    """
+
+    @classmethod
+    def for_canvas(cls, canvas):
+        return cls(canvas.log_file)
+
+    def __init__(self, filename, batch_size=1000):
+        self.filename = filename
+        self.batch_size = batch_size
+        self._lines = []
+        atexit.register(self.flush)
+
+    def record(self, name, args, kw):
+        self.write(format_call(name, args, kw))
+
+    def write(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= self.batch_size:
+            self._write_lines()
+
+    def _write_lines(self):
+        if self._lines:
+            with open(self.filename, "a+") as log:
+                log.write("".join("{}\n".format(line) for line in self._lines))
+            self._lines = []
+
+    def flush(self):
+        self._write_lines()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+
+class ThreadedLogSink(LogSink):
+    """ A LogSink that formats and writes calls on a background thread, so
+    drawing only pays for queueing them. Arguments are formatted after the
+    call returns, so they should not be mutated once drawn.
+    """
+
+    _flush = object()
+
+    def __init__(self, filename, batch_size=1000, max_pending=10000):
+        self._queue = queue.Queue(max_pending)
+        super(ThreadedLogSink, self).__init__(filename, batch_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, name, args, kw):
+        self._queue.put((name, args, kw))
+
+    def write(self, line):
+        self._queue.put(line)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                elif item is self._flush:
+                    self._write_lines()
+                elif isinstance(item, str):
+                    LogSink.write(self, item)
+                else:
+                    LogSink.write(self, format_call(*item))
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        if self._thread.is_alive():
+            self._queue.put(self._flush)
+            self._queue.join()
+
+    def close(self):
+        super(ThreadedLogSink, self).close()
+        self._queue.put(None)
+        self._thread.join()
+
+
+class GraphicsStateContext:
+    def __init__(self, canvas):
         self.canvas = canvas
+
+    def __enter__(self):
+        self.canvas.save_state()
+        return self.canvas
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.canvas.restore_state()
+
+
+class StrokeWidthContext(GraphicsStateContext):
+    def __init__(self, canvas, stroke_width):
+        super(StrokeWidthContext, self).__init__(canvas)
         self.old_width = canvas.stroke_width
         self.new_width = stroke_width
 
     def __enter__(self):
+        super(StrokeWidthContext, self).__enter__()
         self.canvas.set_stroke_width(self.new_width)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.canvas.set_stroke_width(self.old_width)
-
 
-class StrokeColorContext:
+class StrokeColorContext(GraphicsStateContext):
     def __init__(self, canvas, stroke_color):
-        self.canvas = canvas
+        super(StrokeColorContext, self).__init__(canvas)
         self.old_color = canvas.stroke_color
         self.new_color = stroke_color
 
     def __enter__(self):
+        super(StrokeColorContext, self).__enter__()
         self.canvas.set_stroke_color(self.new_color)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.canvas.set_stroke_color(self.old_color)
-
 
-class FillColorContext:
+class FillColorContext(GraphicsStateContext):
     def __init__(self, canvas, fill_color):
-        self.canvas = canvas
+        super(FillColorContext, self).__init__(canvas)
         self.old_color = canvas.fill_color
         self.new_color = fill_color
 
     def __enter__(self):
+        super(FillColorContext, self).__enter__()
         self.canvas.set_fill_color(self.new_color)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.canvas.set_fill_color(self.old_color)
-
 
 class Canvas(object):
     """ An abstract canvas API providing a means to draw shapes on itself
@@ -75,26 +229,83 @@ class Canvas(object):
     Subclasses define library-specific implementations of these basic tools
     """
 
+    cull = True
+
+    log_sinks = {"buffered": LogSink, "threaded": ThreadedLogSink}
+    log_mode = "buffered"
+
     def __init__(self, name, width, height, seed):
         self.name = name
         self.width = width
         self.height = height
         self.seed = seed
+        self.viewport = (0, 0, width, height)
         self.random = random.Random(self.seed)
         self.noise = opensimplex.OpenSimplex(self.seed)
         self.stroke_width = None
         self.stroke_color = None
         self.fill_color = None
+        self.cap_style = None
+        self.join_style = None
+        self.miter_limit = None
+        self.state_stack = []
+        self.clip_region = None
+        self.frame_capture = None
         self.log_file = "{}.log".format(self.name)
+        self.log_sink = None
+        self.set_logging(self.log_mode)
         self.log(
             "canvas = {}({}, {}, {})".format(
                 self.__class__.__name__, repr(name), repr(width), repr(height)
             )
         )
 
+    def set_logging(self, mode):
+        """ Log calls through the sink registered in log_sinks under mode, or
+        stop logging when mode is None.
+        """
+        if self.log_sink is not None:
+            self.log_sink.close()
+        self.log_sink = self.log_sinks[mode].for_canvas(self) if mode else None
+
+    def flush_log(self):
+        if self.log_sink is not None:
+            self.log_sink.flush()
+
     def log(self, msg):
-        with open(self.log_file, "a+") as log:
-            log.write("{}\n".format(msg))
+        if self.log_sink is not None:
+            self.log_sink.write(msg)
+
+    def capture_frames(self, every=None, interval=None, sequence=False):
+        """ Capture debug frames every `every` operations or `interval`
+        seconds, as PNGs or into one sequence file; see FrameCapture. Only
+        backends that provide frame_snapshot, such as CoreGraphics and Pillow,
+        capture anything.
+        """
+        self.stop_capture()
+        self.frame_capture = FrameCapture(self, every, interval, sequence)
+
+    def stop_capture(self):
+        """ Stop capturing frames, once those already captured are written. """
+        if self.frame_capture is not None:
+            self.frame_capture.close()
+            self.frame_capture = None
+
+    def _drew(self):
+        # Backends call this after each operation they draw.
+        if self.frame_capture is not None:
+            self.frame_capture.operation()
+
+    def frame_snapshot(self):
+        """ A copy of the drawing so far, cheap to take, for encode_frame to
+        encode later on another thread. Canvases that can't take one return
+        None, and capture no frames.
+        """
+        pass
+
+    def encode_frame(self, snapshot):
+        """ The PNG bytes of a frame_snapshot. """
+        pass
 
     @property
     def center(self):
@@ -124,29 +335,196 @@ class Canvas(object):
             point.x < 0 or point.x > self.width or point.y < 0 or point.y > self.height
         )
 
-    @log_on_call
+    def is_visible(
+        self, bounds, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Whether a shape with the given bounds, placed as the draw methods
+        place it, can touch the viewport. Shapes that can't are culled before
+        they reach the backend; set cull to False to draw everything.
+
+        The bounds' corners are transformed and boxed again, so the test is
+        conservative under rotation, and is padded by the stroke width, scaled
+        as the backends scale it.
+        """
+        if not self.cull or bounds is None:
+            return True
+
+        min_x, min_y, max_x, max_y = placed_bounds(
+            bounds, at_point, rotation, scale_x, scale_y
+        )
+        scale_y = scale_y if scale_y is not None else scale_x
+        margin = abs(self.stroke_width or 0) * max(abs(scale_x), abs(scale_y), 1)
+        left, bottom, right, top = self.viewport
+        return (
+            min_x - margin <= right
+            and max_x + margin >= left
+            and min_y - margin <= top
+            and max_y + margin >= bottom
+        )
+
+    def set_clip(self, shape=None):
+        """ Opt in to clipping polygons and lines before they reach the
+        backend, to a convex shape given in canvas coordinates, or to the
+        viewport when shape is None.
+
+        Viewport clipping pads the viewport by the stroke width, so the edges
+        clipping adds stay out of sight.
+        """
+        if shape is None:
+            self.clip_region = "viewport"
+        else:
+            self.clip_region = as_coordinates(shape.points)
+
+    def clear_clip(self):
+        self.clip_region = None
+
+    def _clip_region_at(self, at_point, rotation, scale_x, scale_y):
+        """ The clip region mapped back into the coordinates of a shape drawn
+        at at_point, rotated and scaled; None when there is nothing to clip.
+        """
+        if self.clip_region is None:
+            return None
+
+        scale_y = scale_y if scale_y is not None else scale_x
+        if isinstance(self.clip_region, str):
+            # Pad as is_visible does, so strokes along the cut edges stay
+            # off the canvas.
+            margin = abs(self.stroke_width or 0) * max(abs(scale_x), abs(scale_y), 1)
+            left, bottom, right, top = self.viewport
+            left, bottom, right, top = (
+                left - margin, bottom - margin, right + margin, top + margin
+            )
+            region = np.array(
+                [(left, bottom), (right, bottom), (right, top), (left, top)],
+                dtype=float,
+            )
+        else:
+            region = self.clip_region
+
+        if not scale_x or not scale_y:
+            return None
+        placement = Transform.placement(at_point, rotation, scale_x, scale_y)
+        return placement.inverse().apply(region)
+
+    def clipped_polygon(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Clip a polygon to the clip region, if one is set. Returns the
+        points unchanged when not clipping, or a PointArray otherwise.
+        """
+        region = self._clip_region_at(at_point, rotation, scale_x, scale_y)
+        if region is None:
+            return points
+        return PointArray.from_coordinates(
+            clip_polygon(as_coordinates(points), region)
+        )
+
+    def clipped_polyline(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Clip an open polyline to the clip region, if one is set. Returns
+        a list of the PointArrays left inside it.
+        """
+        region = self._clip_region_at(at_point, rotation, scale_x, scale_y)
+        if region is None:
+            return [points]
+        return [
+            PointArray.from_coordinates(run)
+            for run in clip_polyline(as_coordinates(points), region)
+        ]
+
+    # The graphics state. Each set_* method stores its value on the canvas
+    # and hands it to the backend's _apply_* method, unless it is already
+    # set; backends implement the _apply_* methods rather than the setters.
+
+    graphics_state = (
+        ("stroke_width", "set_stroke_width"),
+        ("stroke_color", "set_stroke_color"),
+        ("fill_color", "set_fill_color"),
+        ("cap_style", "set_line_cap"),
+        ("join_style", "set_line_join"),
+        ("miter_limit", "set_miter_limit"),
+    )
+
+    def save_state(self):
+        """ Push the graphics state, to be put back by restore_state. """
+        self.state_stack.append(
+            tuple(getattr(self, attribute) for attribute, _ in self.graphics_state)
+        )
+
+    def restore_state(self):
+        """ Pop the graphics state saved last and set it again. Only values
+        that changed since reach the backend, and values that were never
+        set are left as they are.
+        """
+        state = self.state_stack.pop()
+        for (_, setter), value in zip(self.graphics_state, state):
+            if value is not None:
+                getattr(self, setter)(value)
+
+    def graphics_state_saved(self):
+        """ A context manager saving the graphics state on entry and
+        restoring it on exit.
+        """
+        return GraphicsStateContext(self)
+
+    def order_independent(self):
+        """ A context manager for drawing where paint order doesn't matter.
+        It yields a stand-in canvas to draw on, and on exit draws what was
+        drawn on it here, grouped by state into batches.
+        """
+        # The display list module builds on this one.
+        from .display_list import OrderIndependentBatch
+
+        return OrderIndependentBatch(self)
+
+    @state_setter("join_style")
     def set_line_join(self, join_style):
         self.join_style = join_style
+        self._apply_line_join(join_style)
 
-    @log_on_call
+    @state_setter("cap_style")
     def set_line_cap(self, cap_style):
         self.cap_style = cap_style
+        self._apply_line_cap(cap_style)
 
-    @log_on_call
+    @state_setter("miter_limit")
     def set_miter_limit(self, miter_limit):
         self.miter_limit = miter_limit
+        self._apply_miter_limit(miter_limit)
 
-    @log_on_call
+    @state_setter("stroke_width")
     def set_stroke_width(self, stroke_width):
         self.stroke_width = stroke_width
+        self._apply_stroke_width(stroke_width)
 
-    @log_on_call
+    @state_setter("stroke_color")
     def set_stroke_color(self, stroke_color):
         self.stroke_color = stroke_color
+        self._apply_stroke_color(stroke_color)
 
-    @log_on_call
+    @state_setter("fill_color")
     def set_fill_color(self, fill_color):
         self.fill_color = fill_color
+        self._apply_fill_color(fill_color)
+
+    def _apply_line_join(self, join_style):
+        pass
+
+    def _apply_line_cap(self, cap_style):
+        pass
+
+    def _apply_miter_limit(self, miter_limit):
+        pass
+
+    def _apply_stroke_width(self, stroke_width):
+        pass
+
+    def _apply_stroke_color(self, stroke_color):
+        pass
+
+    def _apply_fill_color(self, fill_color):
+        pass
 
     @log_on_call
     def fill_background(self):
@@ -190,6 +568,64 @@ class Canvas(object):
     ):
         pass
 
+    @log_on_call
+    def draw_polygons(
+        self, polygons, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Draw a batch of polygons with the current state, all placed alike:
+        a sequence of Shapes, PointArrays or sequences of Points, an (m, k, 2)
+        array of m k-gons, or the (coordinates, counts) pair that
+        ragged_coordinates returns.
+
+        Backends that can paint a batch as one path override the batch
+        methods; where shapes in a batch overlap, whether the overlap is
+        painted once or twice depends on the backend. Batches are neither
+        culled nor clipped by the canvas. Here each polygon is drawn in turn.
+        """
+        coordinates, counts = ragged_coordinates(polygons)
+        for polygon in np.split(coordinates, np.cumsum(counts)[:-1]):
+            self.draw_polygon(
+                PointArray.from_coordinates(polygon),
+                at_point,
+                rotation,
+                scale_x,
+                scale_y,
+            )
+
+    @log_on_call
+    def draw_lines(self, lines, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        """ Draw a batch of separate line segments: Lines, or an (n, 4) array
+        of x0, y0, x1, y1 rows.
+        """
+        for x0, y0, x1, y1 in segment_coordinates(lines).tolist():
+            self.draw_line(
+                Point(x0, y0), Point(x1, y1), at_point, rotation, scale_x, scale_y
+            )
+
+    @log_on_call
+    def draw_polyline(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Draw one open path through points. Backends that build it as a
+        path fill it as they do draw_curve; here each segment is drawn as a
+        line.
+        """
+        coordinates = as_coordinates(points).tolist()
+        for (x0, y0), (x1, y1) in zip(coordinates, coordinates[1:]):
+            self.draw_line(
+                Point(x0, y0), Point(x1, y1), at_point, rotation, scale_x, scale_y
+            )
+
+    @log_on_call
+    def draw_circles(
+        self, circles, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        """ Draw a batch of circles: Circles, or an (n, 3) array of x, y,
+        radius rows.
+        """
+        for x, y, radius in circle_coordinates(circles).tolist():
+            self.draw_circle(radius, Point(x, y), at_point, rotation, scale_x, scale_y)
+
     @log_on_call
     def draw_polycurves(
         self, curves, at_point=origin, rotation=0, scale_x=1, scale_y=None
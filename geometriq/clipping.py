@@ -0,0 +1,112 @@
+import numpy as np
+
+
+"""
+Clipping of polygons and polylines against a convex region.
+
+Each function loops over the few edges of the clip region and handles every
+vertex or segment of the subject at once, so clipping a shape costs a handful
+of array operations however many points it has.
+"""
+
+
+def _clip_edges(region):
+    """ The edges of a convex clip region, wound counter-clockwise so the
+    inside lies to the left of each, as start points and direction vectors.
+    """
+    region = np.asarray(region, dtype=float).reshape(-1, 2)
+    following = np.roll(region, -1, axis=0)
+    area = (region[:, 0] * following[:, 1] - following[:, 0] * region[:, 1]).sum()
+    if area < 0:
+        region = region[::-1]
+        following = np.roll(region, -1, axis=0)
+    return region, following - region
+
+
+def _sides(start, direction, points):
+    """ Positive for points left of (inside) an edge, negative right of it. """
+    return direction[0] * (points[:, 1] - start[1]) - direction[1] * (
+        points[:, 0] - start[0]
+    )
+
+
+def clip_polygon(points, region):
+    """ Clip a polygon to a convex region with the Sutherland-Hodgman
+    algorithm.
+
+    points and region are (n, 2) arrays of x, y pairs; the region may wind
+    either way. Returns the clipped polygon as an (m, 2) array, empty if
+    nothing of the polygon lies inside the region.
+
+    >>> square = [(0, 0), (4, 0), (4, 4), (0, 4)]
+    >>> clip_polygon([(2, 2), (6, 2), (6, 6), (2, 6)], square).tolist()
+    [[2.0, 4.0], [2.0, 2.0], [4.0, 2.0], [4.0, 4.0]]
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    for start, direction in zip(*_clip_edges(region)):
+        if not len(points):
+            break
+        previous = np.roll(points, 1, axis=0)
+        sides = _sides(start, direction, points)
+        previous_sides = np.roll(sides, 1)
+        inside = sides >= 0
+        crossing = inside != (previous_sides >= 0)
+
+        # Each vertex emits the crossing into or out of the region on the
+        # edge that reaches it, if any, and then itself if it is inside.
+        emitted = np.empty((len(points), 2, 2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = previous_sides / (previous_sides - sides)
+            emitted[:, 0] = previous + t[:, None] * (points - previous)
+        emitted[:, 1] = points
+        points = emitted[np.column_stack((crossing, inside))]
+    return points
+
+
+def clip_polyline(points, region):
+    """ Clip an open polyline to a convex region, clipping each of its
+    segments at once with the Cyrus-Beck algorithm.
+
+    Returns a list of (m, 2) arrays, one per run of the polyline that stays
+    inside the region.
+
+    >>> square = [(0, 0), (4, 0), (4, 4), (0, 4)]
+    >>> [p.tolist() for p in clip_polyline([(-2, 1), (2, 1), (6, 1)], square)]
+    [[[0.0, 1.0], [2.0, 1.0], [4.0, 1.0]]]
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return []
+
+    starts, ends = points[:-1], points[1:]
+    entering = np.zeros(len(starts))
+    leaving = np.ones(len(starts))
+    visible = np.ones(len(starts), dtype=bool)
+    for start, direction in zip(*_clip_edges(region)):
+        start_sides = _sides(start, direction, starts)
+        change = _sides(start, direction, ends) - start_sides
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = -start_sides / change
+        entering = np.where(change > 0, np.maximum(entering, t), entering)
+        leaving = np.where(change < 0, np.minimum(leaving, t), leaving)
+        visible &= (change != 0) | (start_sides >= 0)
+    visible &= entering <= leaving
+
+    deltas = ends - starts
+    clipped_starts = starts + entering[:, None] * deltas
+    clipped_ends = starts + leaving[:, None] * deltas
+
+    # A run continues while a segment leaves through its end and the next
+    # one enters at its start.
+    runs, current, joined = [], None, None
+    for i in np.flatnonzero(visible).tolist():
+        if joined == i and entering[i] == 0:
+            current.append(clipped_ends[i])
+        else:
+            if current is not None:
+                runs.append(np.array(current))
+            current = [clipped_starts[i], clipped_ends[i]]
+        joined = i + 1 if leaving[i] == 1 else None
+    if current is not None:
+        runs.append(np.array(current))
+    return runs
@@ -3,6 +3,8 @@ from math import sqrt
 
 
 class Color(object):
+    __slots__ = ("r", "g", "b", "a", "_name")
+
     @classmethod
     def from_full_value(cls, r, g, b, a=255):
         return cls(r / 255.0, g / 255.0, b / 255.0, a / 255.0)
@@ -64,6 +66,14 @@ class Color(object):
             new_a = self.a + (((other_color.a - self.a) * s) / steps)
             yield self.__class__(new_r, new_g, new_b, new_a)
 
+    def __eq__(self, other):
+        if not isinstance(other, Color):
+            return NotImplemented
+        return self.rgba() == other.rgba()
+
+    def __hash__(self):
+        return hash(self.rgba())
+
     def __repr__(self):
         return "Color(r={}, g={}, b={}, a={})".format(*self.rgba())
 
@@ -0,0 +1,149 @@
+import atexit
+from math import inf
+import queue
+import struct
+import threading
+from time import monotonic
+
+
+"""
+Sampled debug frames of a canvas as it draws.
+
+A FrameCapture counts the operations drawn on a canvas and captures a frame
+every `every` operations or `interval` seconds, whichever comes first. The
+drawing only pays for a snapshot of the canvas; encoding it as a PNG and
+writing it out happen on a background thread, behind a queue of at most
+max_pending frames, so drawing waits only when encoding falls that far
+behind.
+
+Frames are saved as <name>-<operation>.png, or appended to one <name>.gqf
+sequence file: a magic number, then for each frame its operation number,
+the seconds since capture began, the length of its PNG and the PNG itself.
+Read a sequence back with read_frames. If writing a frame fails, the error
+is kept and raised by the next capture, so a debug run stops instead of
+waiting on a writer that has given up.
+"""
+
+
+FRAMES_MAGIC = b"GQF1"
+
+_FRAME = struct.Struct("<QdI")
+
+
+class FrameCapture(object):
+    """ Captures frames of canvas every `every` operations or `interval`
+    seconds; either can be None to sample on the other alone. Backends
+    provide frame_snapshot and encode_frame, and call Canvas._drew after
+    each operation.
+    """
+
+    every = 1000
+    interval = 1.0
+    max_pending = 8
+
+    def __init__(
+        self, canvas, every=None, interval=None, sequence=False, max_pending=None
+    ):
+        self.canvas = canvas
+        if every is not None:
+            self.every = every
+        if interval is not None:
+            self.interval = interval
+        if max_pending is not None:
+            self.max_pending = max_pending
+
+        self.operations = 0
+        self.frame_count = 0
+        self.error = None
+        self._start = monotonic()
+        self._schedule()
+
+        self.filename = "{}.gqf".format(canvas.name) if sequence else None
+        self._file = None
+        if self.filename is not None:
+            self._file = open(self.filename, "wb")
+            self._file.write(FRAMES_MAGIC)
+
+        self._queue = queue.Queue(self.max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _schedule(self):
+        self._next_operation = self.operations + self.every if self.every else inf
+        self._next_time = monotonic() + self.interval if self.interval else inf
+
+    def operation(self):
+        """ Count an operation, capturing a frame if one is due. """
+        self.operations += 1
+        if self.operations >= self._next_operation or monotonic() >= self._next_time:
+            self.capture()
+
+    def capture(self):
+        """ Snapshot the canvas now and queue the frame to be written, if the
+        canvas can take one. Raises the first error the writer hit.
+        """
+        if self.error is not None:
+            raise self.error
+        snapshot = self.canvas.frame_snapshot()
+        if snapshot is not None and self._thread.is_alive():
+            self._queue.put((self.operations, monotonic() - self._start, snapshot))
+            self.frame_count += 1
+        self._schedule()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            try:
+                if frame is None:
+                    return
+                if self.error is None:
+                    self._write(*frame)
+            except Exception as error:
+                self.error = error
+            finally:
+                self._queue.task_done()
+
+    def _write(self, operation, seconds, snapshot):
+        png = self.canvas.encode_frame(snapshot)
+        if self._file is not None:
+            self._file.write(_FRAME.pack(operation, seconds, len(png)))
+            self._file.write(png)
+        else:
+            with open("{}-{:05}.png".format(self.canvas.name, operation), "wb") as f:
+                f.write(png)
+
+    def flush(self):
+        """ Wait for the frames captured so far to be written, raising the
+        first error the writer hit.
+        """
+        if self._thread.is_alive():
+            self._queue.join()
+            if self._file is not None:
+                self._file.flush()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        atexit.unregister(self.close)
+
+
+def read_frames(filename):
+    """ Yield operation, seconds, PNG bytes for each frame in a sequence
+    file written by FrameCapture.
+    """
+    with open(filename, "rb") as f:
+        if f.read(len(FRAMES_MAGIC)) != FRAMES_MAGIC:
+            raise ValueError("{} is not a geometriq frame sequence".format(filename))
+        while True:
+            header = f.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+            operation, seconds, length = _FRAME.unpack(header)
+            yield operation, seconds, f.read(length)
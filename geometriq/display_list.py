@@ -0,0 +1,438 @@
+from array import array
+import copy
+from math import inf, nan
+
+import numpy as np
+
+from .canvas import Canvas, log_on_call, placed_bounds
+from .journal import _DEFINE, CallDecoder, CallEncoder
+from .shapes import (
+    as_coordinates,
+    circle_coordinates,
+    origin,
+    point_coordinates,
+    ragged_coordinates,
+    segment_coordinates,
+)
+
+
+"""
+Deferred rendering through an in-memory display list.
+
+A RecordingCanvas draws nothing: every draw call and state change made on it
+is packed into a DisplayList with the journal's encoding, alongside the
+bounds of what each draw covers. The list can be replayed into any backend,
+as many times and into as many canvases as needed, and passes over it
+reorder or drop calls without decoding the ones they keep.
+"""
+
+
+_EVERYWHERE = (-inf, -inf, inf, inf)
+_STATE = (nan, nan, nan, nan)
+
+
+def _call_bounds(arguments, kinds):
+    """ The bounding box of a draw call in canvas coordinates, from its
+    points and radius and placement, or None when it has no points.
+    """
+    arrays = []
+    for (parameter, value), kind in zip(arguments.items(), kinds):
+        if parameter == "at_point" or value is None:
+            continue
+        if kind == "points":
+            coordinates = as_coordinates(value)
+        elif kind == "cubic":
+            coordinates = point_coordinates([p for p in value if p is not None])
+        elif kind == "point":
+            coordinates = [(value.x, value.y)]
+        elif kind == "segments":
+            coordinates = segment_coordinates(value).reshape(-1, 2)
+        elif kind == "polygons":
+            coordinates, _ = ragged_coordinates(value)
+        elif kind == "circles":
+            circles = circle_coordinates(value)
+            radii = np.abs(circles[:, 2:])
+            coordinates = np.concatenate(
+                (circles[:, :2] - radii, circles[:, :2] + radii)
+            )
+        else:
+            continue
+        arrays.append(np.asarray(coordinates, dtype=float).reshape(-1, 2))
+
+    coordinates = np.concatenate(arrays) if arrays else np.empty((0, 2))
+    if not len(coordinates):
+        return None
+    radius = abs(arguments.get("radius") or 0)
+    (min_x, min_y), (max_x, max_y) = (
+        coordinates.min(axis=0) - radius,
+        coordinates.max(axis=0) + radius,
+    )
+    return placed_bounds(
+        (min_x, min_y, max_x, max_y),
+        arguments.get("at_point", origin),
+        arguments.get("rotation", 0),
+        arguments.get("scale_x", 1),
+        arguments.get("scale_y"),
+    )
+
+
+class DisplayList(object):
+    """ The calls made on a canvas, packed into one byte buffer with flat
+    arrays of their offsets, operation ids and bounds.
+
+    State changes are the set_* calls, draws the draw_* calls; anything else,
+    such as fill_background, is kept in place by every pass. Passes return a
+    new DisplayList over the same records, in a new order.
+
+    A DisplayList is also a log sink, so any canvas logging in
+    "display_list" mode records one while it draws.
+
+    A list that will never be culled can leave bounded false, to skip
+    working out the bounds of each draw.
+    """
+
+    bounded = True
+
+    @classmethod
+    def for_canvas(cls, canvas):
+        return cls(type(canvas))
+
+    def __init__(self, canvas_class=Canvas):
+        self._encoder = CallEncoder(canvas_class)
+        self._decoder = CallDecoder()
+        self._data = bytearray()
+        self._offsets = array("q")
+        self._operations = array("H")
+        self._bounds = array("d")
+        self._names = []
+        self._state_keys = {}
+        self._stroke_width = 0
+        self.max_stroke_width = 0
+        self._order = None
+
+    def __len__(self):
+        if self._order is not None:
+            return len(self._order)
+        return len(self._offsets)
+
+    def _view(self, order):
+        view = copy.copy(self)
+        view._order = np.asarray(order, dtype=int)
+        return view
+
+    def indices(self):
+        """ The record numbers of the calls in this list, in order. """
+        if self._order is not None:
+            return self._order
+        return np.arange(len(self._offsets))
+
+    @property
+    def bounds(self):
+        """ An (n, 4) array of min x, min y, max x, max y in canvas
+        coordinates for each call: NaN for state changes, infinite for calls
+        whose extent isn't known.
+        """
+        bounds = np.array(self._bounds).reshape(-1, 4)
+        return bounds[self.indices()]
+
+    def record(self, name, args, kw):
+        records, arguments = self._encoder.encode(name, args, kw)
+        for operation, payload in records:
+            if operation == _DEFINE:
+                self._decoder.define(payload, 0)
+                continue
+
+            index = len(self._offsets)
+            self._offsets.append(len(self._data))
+            self._operations.append(operation)
+            self._data += payload
+            self._names.append(name)
+
+            if self._decoder.stateful(operation):
+                _, values = self._decode(index)
+                self._state_keys[index] = repr(values)
+
+            if name.startswith("set_"):
+                bounds = _STATE
+                if name == "set_stroke_width":
+                    self._stroke_width = abs(arguments["stroke_width"] or 0)
+                    self.max_stroke_width = max(
+                        self.max_stroke_width, self._stroke_width
+                    )
+            elif not self.bounded:
+                bounds = _EVERYWHERE
+            else:
+                _, _, kinds = self._encoder.operations[name]
+                bounds = _call_bounds(arguments, kinds)
+                if bounds is None:
+                    bounds = _EVERYWHERE
+                else:
+                    scale_x = abs(arguments.get("scale_x", 1))
+                    scale_y = arguments.get("scale_y")
+                    scale_y = scale_x if scale_y is None else abs(scale_y)
+                    margin = self._stroke_width * max(scale_x, scale_y, 1)
+                    min_x, min_y, max_x, max_y = bounds
+                    bounds = (
+                        min_x - margin,
+                        min_y - margin,
+                        max_x + margin,
+                        max_y + margin,
+                    )
+            self._bounds.extend(bounds)
+
+    def write(self, line):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _decode(self, index):
+        return self._decoder.decode(
+            self._operations[index], self._data, self._offsets[index]
+        )
+
+    def calls(self):
+        """ Yield (name, arguments) for each call, in order. """
+        for index in self.indices().tolist():
+            yield self._decode(index)
+
+    def replay(self, canvas, skip=("save",)):
+        """ Repeat the calls on canvas. Calls named in skip are left out. """
+        for name, arguments in self.calls():
+            if name not in skip:
+                getattr(canvas, name)(*arguments)
+
+    def culled(self, viewport):
+        """ Leave out the draws whose bounds miss viewport, given as left,
+        bottom, right, top like Canvas.viewport.
+        """
+        order = self.indices()
+        bounds = np.array(self._bounds).reshape(-1, 4)[order]
+        left, bottom, right, top = viewport
+        keep = np.isnan(bounds[:, 0]) | (
+            (bounds[:, 0] <= right)
+            & (bounds[:, 2] >= left)
+            & (bounds[:, 1] <= top)
+            & (bounds[:, 3] >= bottom)
+        )
+        return self._view(order[keep])
+
+    def without_redundant_state(self):
+        """ Leave out state changes that set what is already set, or that
+        are overridden or never drawn with.
+        """
+        kept, pending, current = [], {}, {}
+        for index in self.indices().tolist():
+            name = self._names[index]
+            if name.startswith("set_"):
+                pending.pop(name, None)
+                pending[name] = index
+                continue
+            for state, change in pending.items():
+                key = self._state_keys.get(change, change)
+                if current.get(state) != key:
+                    current[state] = key
+                    kept.append(change)
+            pending.clear()
+            kept.append(index)
+        return self._view(kept)
+
+    def sorted_by_state(self):
+        """ Group draws that share the same state together, in the order
+        each state is first drawn with, so it is set once per group rather
+        than once per change back to it.
+
+        This changes which shapes are painted over which, so it is only for
+        drawings that don't depend on draw order. Draws are never moved past
+        other calls, such as fill_background.
+        """
+        kept, current, group = [], {}, []
+
+        def flush_group():
+            firsts = {}
+            for key, state, index in group:
+                firsts.setdefault(key, len(firsts))
+            for key, state, index in sorted(group, key=lambda g: firsts[g[0]]):
+                kept.extend(state)
+                kept.append(index)
+            group.clear()
+
+        for index in self.indices().tolist():
+            name = self._names[index]
+            if name.startswith("set_"):
+                current[name] = index
+                continue
+            state = list(current.values())
+            key = tuple(
+                sorted(
+                    (state_name, self._state_keys.get(change, change))
+                    for state_name, change in current.items()
+                )
+            )
+            if name.startswith("draw_"):
+                group.append((key, state, index))
+            else:
+                flush_group()
+                kept.extend(state)
+                kept.append(index)
+        flush_group()
+        return self._view(kept).without_redundant_state()
+
+
+Canvas.log_sinks["display_list"] = DisplayList
+
+
+class RecordingCanvas(Canvas):
+    """ A canvas that rasterizes nothing and records its calls into a
+    display list instead, to be replayed into real backends later.
+
+    >>> recording = RecordingCanvas("sketch", 100, 100, 1)
+    >>> recording.draw_line(origin, recording.center)
+    >>> [name for name, _ in recording.display_list.calls()]
+    ['draw_line']
+    """
+
+    log_mode = "display_list"
+
+    @property
+    def display_list(self):
+        return self.log_sink
+
+    # Batches are recorded whole, without drawing their shapes one by one.
+
+    @log_on_call
+    def draw_polygons(
+        self, polygons, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        pass
+
+    @log_on_call
+    def draw_lines(self, lines, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        pass
+
+    @log_on_call
+    def draw_polyline(
+        self, points, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        pass
+
+    @log_on_call
+    def draw_circles(
+        self, circles, at_point=origin, rotation=0, scale_x=1, scale_y=None
+    ):
+        pass
+
+    def replay(self, *canvases, cull=True):
+        """ Draw the recording on each canvas, leaving out draws that miss
+        its viewport unless cull is false.
+        """
+        for canvas in canvases:
+            display_list = self.display_list
+            if cull:
+                display_list = display_list.culled(canvas.viewport)
+            display_list.replay(canvas)
+
+
+def _polygon(points):
+    return points
+
+
+def _segment_row(from_point, to_point):
+    return from_point.x, from_point.y, to_point.x, to_point.y
+
+
+def _circle_row(radius, center):
+    return center.x, center.y, radius
+
+
+def _rows(items):
+    return np.array(items, dtype=float)
+
+
+# The single draws a batch can stand in for: the batch method, how to turn
+# the arguments before the placement into one item, and how to pass the
+# items on.
+_BATCHES = {
+    "draw_polygon": ("draw_polygons", _polygon, list),
+    "draw_line": ("draw_lines", _segment_row, _rows),
+    "draw_circle": ("draw_circles", _circle_row, _rows),
+}
+
+
+class OrderIndependentBatch(RecordingCanvas):
+    """ A stand-in for canvas that records what is drawn on it and, on
+    flush, draws it on canvas grouped by state: each state is set once, and
+    each run of polygons, lines or circles placed alike under it is drawn as
+    one batch.
+
+    Shapes end up painted in a different order, so this is only for
+    drawings where that doesn't matter, such as tilings whose tiles don't
+    overlap; tiles that share an edge may swap the pixels along it. Use it
+    through Canvas.order_independent:
+
+    >>> canvas = RecordingCanvas("sketch", 100, 100, 1)
+    >>> with canvas.order_independent() as batch:
+    ...     batch.draw_line(origin, batch.center)
+    ...     batch.draw_line(batch.center, origin)
+    >>> [name for name, _ in canvas.display_list.calls()]
+    ['draw_lines']
+    """
+
+    def __init__(self, canvas):
+        super(OrderIndependentBatch, self).__init__(
+            canvas.name, canvas.width, canvas.height, canvas.seed
+        )
+        self.canvas = canvas
+        self.random = canvas.random
+        self.noise = canvas.noise
+        self.viewport = canvas.viewport
+        self.clip_region = canvas.clip_region
+        for attribute, _ in self.graphics_state:
+            setattr(self, attribute, getattr(canvas, attribute))
+
+    def set_logging(self, mode):
+        super(OrderIndependentBatch, self).set_logging(mode)
+        # Nothing is culled on the way to the canvas.
+        self.display_list.bounded = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def flush(self):
+        """ Draw what has been recorded on the canvas, and start over. """
+        canvas = self.canvas
+        batches = {}
+
+        def draw_batches():
+            for (batch_name, *placement), (collect, items) in batches.items():
+                getattr(canvas, batch_name)(collect(items), *placement)
+            batches.clear()
+
+        # Between state changes, draws are gathered into one batch per batch
+        # method and placement.
+        for name, arguments in self.display_list.sorted_by_state().calls():
+            if name == "save":
+                continue
+            if name in _BATCHES:
+                batch_name, item, collect = _BATCHES[name]
+                key = (batch_name, *arguments[-4:])
+                batches.setdefault(key, (collect, []))[1].append(item(*arguments[:-4]))
+                continue
+            draw_batches()
+            getattr(canvas, name)(*arguments)
+        draw_batches()
+
+        # Leave the canvas in the state the drawing ended in, whichever
+        # group was drawn last.
+        for attribute, setter in self.graphics_state:
+            value = getattr(self, attribute)
+            if value is not None:
+                getattr(canvas, setter)(value)
+        self.set_logging(self.log_mode)
@@ -40,9 +40,59 @@ from geometriq import *
     default="light",
 )
 @click.option("--seed", "-s", help="Randomization seed. Defaults to the current time.", type=int)
+@click.option(
+    "--log/--no-log",
+    help="Write every canvas call to a .log file next to the image. Defaults to on, except with --tiles.",
+    default=None,
+)
+@click.option(
+    "--journal/--no-journal",
+    help="Record canvas calls to a binary .gqj journal instead of the text log, for geometriq-replay.",
+    default=False,
+)
+@click.option(
+    "--tiles",
+    help="Render with Pillow instead, in this many tiles rasterized in parallel worker processes.",
+    type=int,
+    default=0,
+)
+@click.option(
+    "--processes",
+    help="Worker processes for --tiles. Defaults to one per core.",
+    type=int,
+)
+@click.option(
+    "--debug-every",
+    help="With $GEOMETRIQ_DEBUG set, capture a debug frame every this many operations. Can be set in $GEOMETRIQ_DEBUG_EVERY. Defaults to 1000.",
+    type=int,
+    envvar="GEOMETRIQ_DEBUG_EVERY",
+)
+@click.option(
+    "--debug-interval",
+    help="With $GEOMETRIQ_DEBUG set, also capture a debug frame every this many seconds. Can be set in $GEOMETRIQ_DEBUG_INTERVAL. Defaults to 1.",
+    type=float,
+    envvar="GEOMETRIQ_DEBUG_INTERVAL",
+)
+@click.option(
+    "--debug-sequence/--no-debug-sequence",
+    help="Write debug frames into one .gqf sequence file instead of a PNG each.",
+    default=False,
+)
 @click.argument("geometriq-script")
 def geometriq_cli(
-    dimensions, geometriq_directory, output_dir, contrast, seed, geometriq_script
+    dimensions,
+    geometriq_directory,
+    output_dir,
+    contrast,
+    seed,
+    log,
+    journal,
+    tiles,
+    processes,
+    debug_every,
+    debug_interval,
+    debug_sequence,
+    geometriq_script,
 ):
     """Generate art from a GEOMETRIQ_SCRIPT.
     """
@@ -90,10 +140,27 @@ def geometriq_cli(
     outputDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), output_dir)
     filename = os.path.join(outputDir, "{}".format(dated_name))
 
-    canvas = CoreGraphicsCanvas(filename, width, height, seed, debug=DEBUG)
+    if tiles and (journal or log):
+        raise click.UsageError(
+            "--tiles records canvas calls in memory, and writes no --log or --journal"
+        )
+
+    if tiles:
+        TiledPillowCanvas.tiles = tiles
+        TiledPillowCanvas.processes = processes
+        canvas = TiledPillowCanvas(filename, width, height, seed)
+    else:
+        if journal:
+            CoreGraphicsCanvas.log_mode = "journal"
+        elif log is False:
+            CoreGraphicsCanvas.log_mode = None
+        canvas = CoreGraphicsCanvas(filename, width, height, seed)
+        if DEBUG:
+            canvas.capture_frames(debug_every, debug_interval, debug_sequence)
+        # The cap and join constants come from Quartz.
+        canvas.set_line_cap(kCGLineCapRound)
+        canvas.set_line_join(kCGLineJoinMiter)
     canvas.set_miter_limit(15)
-    canvas.set_line_cap(kCGLineCapRound)
-    canvas.set_line_join(kCGLineJoinMiter)
     canvas.set_stroke_color(clear)
     canvas.set_stroke_width(4)
     canvas.set_fill_color(background_fills[contrast])
@@ -109,6 +176,55 @@ def geometriq_cli(
         pass
     finally:
         canvas.save()
+        canvas.stop_capture()
+        canvas.flush_log()
+
+
+@click.command()
+@click.option(
+    "--start", help="First call to replay. Defaults to the first.", type=int, default=0
+)
+@click.option(
+    "--stop",
+    help="Call to stop before. Defaults to replaying to the end.",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--backend",
+    help="Canvas to replay into. Defaults to the one that recorded the journal.",
+    type=click.Choice(["CoreGraphicsCanvas", "PillowCanvas"]),
+)
+@click.option(
+    "--output",
+    help="Name of the rerendered image. Defaults to the journal's name and range.",
+    type=str,
+)
+@click.option("--count", help="Print the number of calls and exit.", is_flag=True)
+@click.argument("journal-file", type=click.Path(exists=True, dir_okay=False))
+def geometriq_replay(start, stop, backend, output, count, journal_file):
+    """Rerender a JOURNAL_FILE recorded with --journal, in whole or in part.
+    """
+
+    journal = Journal(journal_file)
+    if count:
+        click.echo(len(journal))
+        return
+
+    canvas_class = globals().get(backend or journal.canvas_class)
+    if canvas_class is None:
+        raise click.UsageError(
+            "{} is not available here".format(backend or journal.canvas_class)
+        )
+    canvas_class.log_mode = None
+
+    if output is None:
+        output = "{}_replay_{}-{}".format(
+            journal.name, start, stop if stop is not None else len(journal)
+        )
+    canvas = canvas_class(output, journal.width, journal.height, journal.seed)
+    journal.replay(canvas, start, stop)
+    canvas.save()
 
 
 if __name__ == "__main__":
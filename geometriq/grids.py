@@ -1,9 +1,86 @@
 from math import sqrt
 
-from .shapes import Point, Line
+import numpy as np
+
+from .shapes import (
+    Diamond,
+    EastTriangle,
+    HorizontalHexagon,
+    Line,
+    NorthTriangle,
+    Point,
+    SouthTriangle,
+    Square,
+    VerticalHexagon,
+    WestTriangle,
+    as_coordinates,
+    line_distances,
+)
+from .spatial import KDTree
+from .topology import GridTopology
+
+
+def _parity_bound(bound, parity):
+    """ The largest index of the given parity within [-bound, bound]. """
+    return bound if (bound - parity) % 2 == 0 else bound - 1
+
+
+def _round_to_parity(value, parity, bound):
+    index = 2 * round((value - parity) / 2) + parity
+    return max(-bound, min(bound, index))
+
+
+def _cube_round(q, r):
+    """ Round fractional axial hexagon coordinates to the containing hexagon. """
+    s = -q - r
+    rq, rr, rs = np.rint(q), np.rint(r), np.rint(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return np.column_stack((rq, rr)).astype(int)
+
+
+def _triangle_indices(alpha, beta):
+    """ Locate points given in the skewed (alpha, beta) coordinates of a
+    triangle lattice: each unit rhombus splits into a lower (k=0) and an upper
+    (k=1) triangle.
+    """
+    a, b = np.floor(alpha), np.floor(beta)
+    k = (alpha - a) + (beta - b) >= 1
+    return a, b, k.astype(int)
+
+
+def _offset_vertices(anchors, offsets):
+    """ Add a (sides, 2) table of vertex offsets to (n, 2) anchor indices. """
+    return anchors[:, None, :] + np.asarray(offsets)[None, :, :]
+
+
+def _anchored_triangles(i, j):
+    """ Both triangles of the rhombus based at each vertex. """
+    anchors = np.column_stack((i, j))
+    return np.concatenate(
+        (
+            np.column_stack((anchors, np.zeros(len(anchors), dtype=int))),
+            np.column_stack((anchors, np.ones(len(anchors), dtype=int))),
+        )
+    )
 
 
 class Grid(object):
+    """ A finite lattice of points mirrored about a start point.
+
+    Vertex (i, j) sits at start + (i * dx, j * dy) for |i| <= max_i and
+    |j| <= max_j; checkerboard lattices only use vertices where i + j is even.
+    Points are computed from their indices rather than stored, so nearest
+    vertex lookup is a rounding operation and large grids cost no memory until
+    their points are asked for.
+    """
+
+    checkerboard = False
+    cell_kinds = ()
+
     def __init__(self, start, size, iterations_wide, iterations_tall):
         self.start = start
         self.size = float(size)
@@ -14,52 +91,236 @@ class Grid(object):
             1 if iterations_tall % size == 0 else 0
         )
 
-        self.points = self._generate_points()
+        self.dx, self.dy, self.max_i, self.max_j = self._lattice()
+        self._index = None
+        self._topologies = {}
+
+    def _lattice(self):
+        """ Return the lattice spacing and index bounds: dx, dy, max_i, max_j """
+        raise NotImplementedError
 
-    def _generate_points(self):
-        pass
+    def indices(self):
+        """ Return the i and j index arrays of every vertex in the grid. """
+        i, j = np.meshgrid(
+            np.arange(-self.max_i, self.max_i + 1),
+            np.arange(-self.max_j, self.max_j + 1),
+            indexing="ij",
+        )
+        i, j = i.ravel(), j.ravel()
+        if self.checkerboard:
+            keep = (i + j) % 2 == 0
+            i, j = i[keep], j[keep]
+        return i, j
+
+    def coordinates(self, i=None, j=None):
+        """ Return an (n, 2) array of vertex coordinates, for every vertex or
+        for the given index arrays.
+        """
+        if i is None:
+            i, j = self.indices()
+        return np.column_stack(
+            (
+                self.start.x + np.asarray(i) * self.dx,
+                self.start.y + np.asarray(j) * self.dy,
+            )
+        )
 
-    def _offsets(self, x, y):
-        return x, y
+    def point_at(self, i, j):
+        return Point(self.start.x + i * self.dx, self.start.y + j * self.dy)
+
+    @property
+    def points(self):
+        """ The grid's vertices as a set of Points, built on each access. """
+        return set(self)
+
+    def __iter__(self):
+        for x, y in self.coordinates().tolist():
+            yield Point(x, y)
+
+    def __len__(self):
+        if not self.checkerboard:
+            return (2 * self.max_i + 1) * (2 * self.max_j + 1)
+
+        even_i = 2 * (self.max_i // 2) + 1
+        even_j = 2 * (self.max_j // 2) + 1
+        odd_i = 2 * self.max_i + 1 - even_i
+        odd_j = 2 * self.max_j + 1 - even_j
+        return even_i * even_j + odd_i * odd_j
+
+    def _contains_index(self, i, j):
+        return (
+            abs(i) <= self.max_i
+            and abs(j) <= self.max_j
+            and not (self.checkerboard and (i + j) % 2)
+        )
 
-    def _mirrored_points(self, x, y, x_idx, y_idx):
-        mirror = set()
-        x_offset, y_offset = self._offsets(x_idx, y_idx)
-        mirror.add(Point(self.start.x + (x + x_offset), self.start.y + (y + y_offset)))
-        mirror.add(Point(self.start.x + (x + x_offset), self.start.y - (y + y_offset)))
-        mirror.add(Point(self.start.x - (x + x_offset), self.start.y + (y + y_offset)))
-        mirror.add(Point(self.start.x - (x + x_offset), self.start.y - (y + y_offset)))
+    def contains_indices(self, i, j):
+        """ Vectorized test of which (i, j) index pairs are grid vertices. """
+        i, j = np.asarray(i), np.asarray(j)
+        inside = (np.abs(i) <= self.max_i) & (np.abs(j) <= self.max_j)
+        if self.checkerboard:
+            inside &= (i + j) % 2 == 0
+        return inside
+
+    def __contains__(self, point):
+        i = round((point.x - self.start.x) / self.dx)
+        j = round((point.y - self.start.y) / self.dy)
+        return self._contains_index(i, j) and self.point_at(i, j) == point
+
+    def index_of(self, point):
+        """ Return the (i, j) index of the grid vertex nearest to point. """
+        u = (point.x - self.start.x) / self.dx
+        v = (point.y - self.start.y) / self.dy
+
+        if not self.checkerboard:
+            return (
+                max(-self.max_i, min(self.max_i, round(u))),
+                max(-self.max_j, min(self.max_j, round(v))),
+            )
 
-        return mirror
+        best = None
+        for parity in (0, 1):
+            bound_i = _parity_bound(self.max_i, parity)
+            bound_j = _parity_bound(self.max_j, parity)
+            if bound_i < 0 or bound_j < 0:
+                continue
+            i = _round_to_parity(u, parity, bound_i)
+            j = _round_to_parity(v, parity, bound_j)
+            distance = ((i - u) * self.dx) ** 2 + ((j - v) * self.dy) ** 2
+            if best is None or distance < best[0]:
+                best = (distance, i, j)
+        return best[1], best[2]
+
+    def _lattice_coordinates(self, points):
+        coordinates = as_coordinates(points)
+        u = (coordinates[:, 0] - self.start.x) / self.dx
+        v = (coordinates[:, 1] - self.start.y) / self.dy
+        return u, v
+
+    def nearest_indices(self, points):
+        """ Vectorized index_of: map Points, a PointArray or an (n, 2) array of
+        coordinates to the i and j index arrays of their nearest grid vertices.
+        """
+        u, v = self._lattice_coordinates(points)
+
+        if not self.checkerboard:
+            i = np.clip(np.rint(u), -self.max_i, self.max_i).astype(int)
+            j = np.clip(np.rint(v), -self.max_j, self.max_j).astype(int)
+            return i, j
+
+        best_i = best_j = best_distance = None
+        for parity in (0, 1):
+            bound_i = _parity_bound(self.max_i, parity)
+            bound_j = _parity_bound(self.max_j, parity)
+            if bound_i < 0 or bound_j < 0:
+                continue
+            i = np.clip(2 * np.rint((u - parity) / 2) + parity, -bound_i, bound_i)
+            j = np.clip(2 * np.rint((v - parity) / 2) + parity, -bound_j, bound_j)
+            distance = ((i - u) * self.dx) ** 2 + ((j - v) * self.dy) ** 2
+            if best_distance is None:
+                best_i, best_j, best_distance = i, j, distance
+            else:
+                closer = distance < best_distance
+                best_i = np.where(closer, i, best_i)
+                best_j = np.where(closer, j, best_j)
+                best_distance = np.where(closer, distance, best_distance)
+        return best_i.astype(int), best_j.astype(int)
+
+    @property
+    def index(self):
+        """ A KDTree over the grid's points, built on first use. """
+        if self._index is None:
+            self._index = KDTree(self.coordinates())
+        return self._index
 
     def closest_point_to(self, other_point):
-        distance, point = min([(x.distance_to(other_point), x) for x in self.points])
-        return point if distance < 0.05 * self.size else other_point
+        point = self.point_at(*self.index_of(other_point))
+        if point.distance_to(other_point) < 0.05 * self.size:
+            return point
+        return other_point
+
+    def cell_indices(self, points, kind=None):
+        """ Map Points, a PointArray or an (n, 2) array of coordinates to the
+        indices of the cells containing them, one row per point.
+
+        Cells tile the plane beyond the grid's own extent, so every point has
+        a cell. kind picks between the cell shapes a grid supports, listed in
+        cell_kinds; the first is the default.
+        """
+        kind = kind or self.cell_kinds[0]
+        u, v = self._lattice_coordinates(points)
+        return getattr(self, "_{}_indices".format(kind))(u, v)
+
+    def cell_shape(self, index, kind=None):
+        """ Build the shape of the cell with the given index. """
+        kind = kind or self.cell_kinds[0]
+        return getattr(self, "_{}_shape".format(kind))(*index)
+
+    def cell_at(self, point, kind=None):
+        """ Return the index and shape of the cell containing point. """
+        index = tuple(self.cell_indices([point], kind)[0].tolist())
+        return index, self.cell_shape(index, kind)
+
+    def cell_vertices(self, indices, kind=None):
+        """ Return the (i, j) vertex indices of each cell, as an array shaped
+        (cells, sides, 2) in the same order as the cell shape's points.
+        """
+        kind = kind or self.cell_kinds[0]
+        indices = np.asarray(indices, dtype=int)
+        indices = indices.reshape(len(indices), -1) if indices.size else indices
+        return getattr(self, "_{}_vertices".format(kind))(indices)
+
+    def topology(self, kind=None):
+        """ The GridTopology of the cells lying wholly inside the grid, built
+        on first use.
+        """
+        kind = kind or self.cell_kinds[0]
+        if kind not in self._topologies:
+            i, j = self.indices()
+            anchored = getattr(self, "_{}_anchored".format(kind))(i, j)
+            self._topologies[kind] = GridTopology(self, anchored, kind)
+        return self._topologies[kind]
+
+    def _points_by_distance(self, coordinates, distances, k=None):
+        """ The grid's points in order of distance, or just the k nearest,
+        picked by partial selection before sorting.
+        """
+        if k is not None and k < len(distances):
+            if k <= 0:
+                return []
+            nearest = np.argpartition(distances, k - 1)[:k]
+            order = nearest[np.argsort(distances[nearest], kind="stable")]
+        else:
+            order = np.argsort(distances, kind="stable")
+        return [Point(x, y) for x, y in coordinates[order].tolist()]
 
-    def radial_sort(self, center):
-        points = list(self.points)
-        return sorted(
-            points, cmp=lambda a, b: cmp(a.distance_to(center), b.distance_to(center))
+    def _sorted_by_center(self, center, k=None):
+        coordinates = self.coordinates()
+        distances = np.hypot(
+            coordinates[:, 0] - center.x, coordinates[:, 1] - center.y
         )
+        return self._points_by_distance(coordinates, distances, k)
+
+    def _sorted_by_line(self, line, k=None):
+        coordinates = self.coordinates()
+        distances = line_distances(line, coordinates)
+        return self._points_by_distance(coordinates, distances, k)
+
+    def radial_sort(self, center):
+        """ The grid's points, nearest to center first. """
+        return self._sorted_by_center(center)
 
     def linear_sort(self, line):
-        points = list(self.points)
-        if line.slope is None:  # vertical line shortcut
-            sorted_points = sorted(
-                points,
-                lambda a, b: cmp(abs(a.x - line.center.x), abs(b.x - line.center.x)),
-            )
-        elif line.slope == 0:  # horizontal line shortcut
-            sorted_points = sorted(
-                points,
-                lambda a, b: cmp(abs(a.y - line.center.y), abs(b.y - line.center.y)),
-            )
-        else:
-            sorted_points = sorted(
-                points, lambda a, b: cmp(line.distance_to(a), line.distance_to(b))
-            )
+        """ The grid's points, nearest to line (extended infinitely) first. """
+        return self._sorted_by_line(line)
 
-        return sorted_points
+    def nearest_k(self, center, k):
+        """ The k grid points nearest to center, nearest first. """
+        return self._sorted_by_center(center, k)
+
+    def nearest_k_to_line(self, line, k):
+        """ The k grid points nearest to line, nearest first. """
+        return self._sorted_by_line(line, k)
 
 
 class SquareGrid(Grid):
@@ -88,20 +349,32 @@ class SquareGrid(Grid):
     True
     >>> Point(3, 3) in square_grid.points
     False
+    >>> square_grid.cell_at(Point(5.5, 4.5))[0]
+    (0, -1)
     """
 
-    def _generate_points(self):
-        points = set()
+    cell_kinds = ("square",)
+
+    def _lattice(self):
+        return (
+            self.size,
+            self.size,
+            self.iterations_wide - 1,
+            self.iterations_tall - 1,
+        )
 
-        for y in range(self.iterations_tall):
-            for x in range(self.iterations_wide):
+    def _square_indices(self, u, v):
+        # A square cell is indexed by its lower left vertex.
+        return np.column_stack((np.floor(u), np.floor(v))).astype(int)
 
-                p_x = x * self.size
-                p_y = y * self.size
+    def _square_shape(self, i, j):
+        return Square(self.size, self.point_at(i + 0.5, j + 0.5))
 
-                points.update(self._mirrored_points(p_x, p_y, x, y))
+    def _square_anchored(self, i, j):
+        return np.column_stack((i, j))
 
-        return points
+    def _square_vertices(self, cells):
+        return _offset_vertices(cells, [(0, 0), (0, 1), (1, 1), (1, 0)])
 
 
 class DiamondGrid(Grid):
@@ -109,30 +382,48 @@ class DiamondGrid(Grid):
 
     """
 
+    cell_kinds = ("diamond",)
+
     def __init__(self, start, size, iterations_wide, iterations_tall):
         self.step = sqrt(size ** 2 / 2)
         super(DiamondGrid, self).__init__(start, size, iterations_wide, iterations_tall)
 
-    def _generate_points(self):
-        points = set()
+    def _lattice(self):
+        return (
+            self.step,
+            self.step,
+            self.iterations_wide - 1,
+            self.iterations_tall - 1,
+        )
 
-        for y in range(self.iterations_tall):
-            for x in range(self.iterations_wide):
+    def _diamond_indices(self, u, v):
+        # A diamond cell is indexed by its center vertex, where i + j is even;
+        # in coordinates rotated by 45 degrees the cells are unit squares.
+        a = np.rint((u + v) / 2)
+        b = np.rint((u - v) / 2)
+        return np.column_stack((a + b, a - b)).astype(int)
 
-                p_x = x * self.step
-                y_offset = 0 if x % 2 == 0 else self.step
-                p_y = y * self.step - y_offset
+    def _diamond_shape(self, i, j):
+        return Diamond(self.size, self.point_at(i, j))
 
-                points.update(self._mirrored_points(p_x, p_y, x, y))
+    def _diamond_anchored(self, i, j):
+        keep = (i + j) % 2 == 0
+        return np.column_stack((i[keep], j[keep]))
 
-        return points
+    def _diamond_vertices(self, cells):
+        return _offset_vertices(cells, [(-1, 0), (0, 1), (1, 0), (0, -1)])
 
 
 class HorizontalHexagonGrid(Grid):
     """ A grid of points arranged in equilateral triangles, aligned horizontally.
 
+    Its cells are North and South triangles, or flat-topped hexagons centered
+    on every third vertex.
     """
 
+    checkerboard = True
+    cell_kinds = ("triangle", "hexagon")
+
     def __init__(self, start, size, iterations_wide, iterations_tall):
         self.step = sqrt(size ** 2 - (size / 2) ** 2)
         self.r = sqrt(3) * size / 6
@@ -140,30 +431,65 @@ class HorizontalHexagonGrid(Grid):
             start, size, iterations_wide, iterations_tall
         )
 
-    def _offsets(self, x, y):
-        y_offset = y * self.step
-        y_offset += 0 if x % 2 == 0 else self.step
-        return x, y_offset
-
-    def _generate_points(self):
-        points = set()
-
-        for y in range(self.iterations_tall):
-            for x in range(self.iterations_wide):
-
-                p_x = x * (self.size / 2)
-                p_y = y * self.step
-
-                points.update(self._mirrored_points(p_x, p_y, x, y))
+    def _lattice(self):
+        return (
+            self.size / 2,
+            self.step,
+            self.iterations_wide - 1,
+            2 * self.iterations_tall - 1,
+        )
 
-        return points
+    def _triangle_indices(self, u, v):
+        # A triangle cell is indexed by the vertex at the lower left of its
+        # rhombus and k: 0 for the North triangle, 1 for the South one.
+        a, b, k = _triangle_indices((u - v) / 2, v)
+        return np.column_stack((2 * a + b, b, k)).astype(int)
+
+    def _triangle_shape(self, i, j, k):
+        if k:
+            return SouthTriangle(self.size, self.point_at(i + 2, j + 2 / 3))
+        return NorthTriangle(self.size, self.point_at(i + 1, j + 1 / 3))
+
+    def _hexagon_indices(self, u, v):
+        # A hexagon cell is indexed by its axial coordinates q, r; its center
+        # is the vertex (3q, q + 2r).
+        q = u / 3
+        return _cube_round(q, (v - q) / 2)
+
+    def _hexagon_shape(self, q, r):
+        return HorizontalHexagon(self.size, self.point_at(3 * q, q + 2 * r))
+
+    def _triangle_anchored(self, i, j):
+        return _anchored_triangles(i, j)
+
+    def _triangle_vertices(self, cells):
+        north = _offset_vertices(cells[:, :2], [(0, 0), (1, 1), (2, 0)])
+        south = _offset_vertices(cells[:, :2], [(1, 1), (3, 1), (2, 0)])
+        return np.where(cells[:, 2, None, None] == 1, south, north)
+
+    def _hexagon_anchored(self, i, j):
+        keep = i % 3 == 0
+        q = i[keep] // 3
+        return np.column_stack((q, (j[keep] - q) // 2))
+
+    def _hexagon_vertices(self, cells):
+        q, r = cells[:, 0], cells[:, 1]
+        centers = np.column_stack((3 * q, q + 2 * r))
+        return _offset_vertices(
+            centers, [(1, 1), (2, 0), (1, -1), (-1, -1), (-2, 0), (-1, 1)]
+        )
 
 
 class VerticalHexagonGrid(Grid):
     """ A grid of points arranged in equilateral triangles, aligned vertically.
 
+    Its cells are East and West triangles, or pointy-topped hexagons centered
+    on every third vertex.
     """
 
+    checkerboard = True
+    cell_kinds = ("triangle", "hexagon")
+
     def __init__(self, start, size, iterations_wide, iterations_tall):
         self.step = sqrt(size ** 2 - (size / 2) ** 2)
         self.r = sqrt(3) * size / 6
@@ -171,20 +497,50 @@ class VerticalHexagonGrid(Grid):
             start, size, iterations_wide, iterations_tall
         )
 
-    def _offsets(self, x, y):
-        y_offset = y * (self.size / 2)
-        y_offset += 0 if x % 2 == 0 else (self.size / 2)
-        return x, y_offset
-
-    def _generate_points(self):
-        points = set()
-
-        for y in range(self.iterations_tall):
-            for x in range(self.iterations_wide):
-
-                p_x = x * self.step
-                p_y = y * (self.size / 2)
-
-                points.update(self._mirrored_points(p_x, p_y, x, y))
+    def _lattice(self):
+        return (
+            self.step,
+            self.size / 2,
+            self.iterations_wide - 1,
+            2 * self.iterations_tall - 1,
+        )
 
-        return points
+    def _triangle_indices(self, u, v):
+        # A triangle cell is indexed by the vertex at the bottom of its rhombus
+        # and k: 0 for the East triangle, 1 for the West one.
+        a, b, k = _triangle_indices((v - u) / 2, u)
+        return np.column_stack((b, 2 * a + b, k)).astype(int)
+
+    def _triangle_shape(self, i, j, k):
+        if k:
+            return WestTriangle(self.size, self.point_at(i + 2 / 3, j + 2))
+        return EastTriangle(self.size, self.point_at(i + 1 / 3, j + 1))
+
+    def _hexagon_indices(self, u, v):
+        # A hexagon cell is indexed by its axial coordinates q, r; its center
+        # is the vertex (2q + r, 3r).
+        r = v / 3
+        return _cube_round((u - r) / 2, r)
+
+    def _hexagon_shape(self, q, r):
+        return VerticalHexagon(self.size, self.point_at(2 * q + r, 3 * r))
+
+    def _triangle_anchored(self, i, j):
+        return _anchored_triangles(i, j)
+
+    def _triangle_vertices(self, cells):
+        east = _offset_vertices(cells[:, :2], [(0, 0), (0, 2), (1, 1)])
+        west = _offset_vertices(cells[:, :2], [(0, 2), (1, 3), (1, 1)])
+        return np.where(cells[:, 2, None, None] == 1, west, east)
+
+    def _hexagon_anchored(self, i, j):
+        keep = j % 3 == 0
+        r = j[keep] // 3
+        return np.column_stack(((i[keep] - r) // 2, r))
+
+    def _hexagon_vertices(self, cells):
+        q, r = cells[:, 0], cells[:, 1]
+        centers = np.column_stack((2 * q + r, 3 * r))
+        return _offset_vertices(
+            centers, [(0, 2), (1, 1), (1, -1), (0, -2), (-1, -1), (-1, 1)]
+        )
@@ -0,0 +1,249 @@
+import heapq
+from itertools import combinations
+from math import hypot, inf
+
+import numpy as np
+
+from .shapes import Point, Line, segment_coordinates
+
+
+"""
+All-pairs intersection of line segments with a Bentley-Ottmann sweep.
+
+A vertical sweep line moves left to right over the segment endpoints and
+the crossings found so far, keeping the segments it currently cuts ordered
+from bottom to top. Only segments that become neighbours in that order are
+ever tested against each other, so n segments with k intersections cost
+O((n + k) log n) tests instead of n * (n - 1) / 2.
+"""
+
+
+class _Sweep(object):
+    def __init__(self, segments, tolerance):
+        segments = np.array(segment_coordinates(segments))
+
+        # Orient every segment from its lexicographically smallest end.
+        flip = (segments[:, 2] < segments[:, 0]) | (
+            (segments[:, 2] == segments[:, 0]) & (segments[:, 3] < segments[:, 1])
+        )
+        segments[flip] = segments[flip][:, [2, 3, 0, 1]]
+
+        if tolerance is None:
+            extent = float(np.abs(segments).max()) if len(segments) else 1.0
+            tolerance = 1e-9 * max(extent, 1.0)
+        self.tolerance = tolerance
+
+        self.x0, self.y0, self.x1, self.y1 = (segments[:, k].tolist() for k in range(4))
+        dx, dy = segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]
+        vertical = dx == 0
+        self.slopes = np.where(vertical, inf, dy / np.where(vertical, 1, dx)).tolist()
+        self.vertical = vertical.tolist()
+
+        self.events = {}
+        self.queue = []
+        for i in range(len(segments)):
+            start, end = (self.x0[i], self.y0[i]), (self.x1[i], self.y1[i])
+            if start == end:
+                continue
+            self._event(start).append(i)
+            self._event(end)
+        self.tested = set()
+        self.status = []
+
+    def _event(self, point):
+        try:
+            return self.events[point]
+        except KeyError:
+            heapq.heappush(self.queue, point)
+            starts = self.events[point] = []
+            return starts
+
+    def _y_at(self, i, x, y):
+        """ Where segment i cuts the sweep line at the event point x, y. A
+        vertical segment covers its whole y-range on the sweep line, so it
+        sits at the event's y within that range, and at its nearer end
+        outside it.
+        """
+        if self.vertical[i]:
+            return min(max(y, self.y0[i]), self.y1[i])
+        return self.y0[i] + (x - self.x0[i]) * self.slopes[i]
+
+    def _distance(self, i, x, y):
+        x0, y0 = self.x0[i], self.y0[i]
+        dx, dy = self.x1[i] - x0, self.y1[i] - y0
+        t = ((x - x0) * dx + (y - y0) * dy) / (dx * dx + dy * dy)
+        t = min(max(t, 0.0), 1.0)
+        return hypot(x0 + t * dx - x, y0 + t * dy - y)
+
+    def _position(self, x, y):
+        """ The first status position whose segment lies on or above x, y. """
+        status, low, high = self.status, 0, len(self.status)
+        while low < high:
+            middle = (low + high) // 2
+            if self._y_at(status[middle], x, y) < y:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _intersection(self, a, b):
+        if a > b:
+            a, b = b, a
+        x0, y0 = self.x0[a], self.y0[a]
+        rx, ry = self.x1[a] - x0, self.y1[a] - y0
+        qx, qy = self.x0[b] - x0, self.y0[b] - y0
+        sx, sy = self.x1[b] - self.x0[b], self.y1[b] - self.y0[b]
+
+        denominator = rx * sy - ry * sx
+        if denominator == 0:
+            return None  # parallel
+        t = (qx * sy - qy * sx) / denominator
+        u = (qx * ry - qy * rx) / denominator
+        slack_a = self.tolerance / hypot(rx, ry)
+        slack_b = self.tolerance / hypot(sx, sy)
+        if not (-slack_a <= t <= 1 + slack_a and -slack_b <= u <= 1 + slack_b):
+            return None
+
+        # A crossing with a vertical segment is on its x exactly, or it could
+        # round to just before the event that found it.
+        if self.vertical[a]:
+            point = (x0, self._y_at(b, x0, y0))
+        elif self.vertical[b]:
+            point = (self.x0[b], self._y_at(a, self.x0[b], y0))
+        else:
+            point = (x0 + t * rx, y0 + t * ry)
+
+        # Snap crossings at an endpoint onto it, so they share its event.
+        for i in (a, b):
+            for end in ((self.x0[i], self.y0[i]), (self.x1[i], self.y1[i])):
+                if hypot(end[0] - point[0], end[1] - point[1]) <= self.tolerance:
+                    return end
+        return point
+
+    def _test(self, a, b, current):
+        pair = (a, b) if a < b else (b, a)
+        if pair in self.tested:
+            return
+        self.tested.add(pair)
+
+        point = self._intersection(a, b)
+        if point is None:
+            return
+        # A crossing rounded to within tolerance of the sweep's x is on it.
+        if abs(point[0] - current[0]) <= self.tolerance:
+            point = (current[0], point[1])
+        if point <= current:
+            return
+        if hypot(point[0] - current[0], point[1] - current[1]) <= self.tolerance:
+            return
+        self._event(point)
+
+    def run(self):
+        status = self.status
+        previous = None
+        while self.queue:
+            point = heapq.heappop(self.queue)
+            starts = self.events.pop(point)
+            x, y = point
+
+            # Nearly coincident crossings computed from different pairs are
+            # the same crossing, already handled at the first of them.
+            if (
+                not starts
+                and previous is not None
+                and hypot(x - previous[0], y - previous[1]) <= self.tolerance
+            ):
+                continue
+
+            # The segments through the point sit together in the status.
+            low = high = self._position(x, y)
+            while low > 0 and self._distance(status[low - 1], x, y) <= self.tolerance:
+                low -= 1
+            while (
+                high < len(status)
+                and self._distance(status[high], x, y) <= self.tolerance
+            ):
+                high += 1
+            through = status[low:high]
+
+            if len(starts) + len(through) > 1:
+                yield point, tuple(sorted(starts + through))
+            previous = point
+
+            continuing = [
+                i
+                for i in through
+                if hypot(self.x1[i] - x, self.y1[i] - y) > self.tolerance
+            ]
+            # Just right of the point, segments through it stack up by slope.
+            following = sorted(starts + continuing, key=lambda i: (self.slopes[i], i))
+            status[low:high] = following
+
+            above = low + len(following)
+            if not following:
+                if 0 < low < len(status):
+                    self._test(status[low - 1], status[low], point)
+                continue
+            if low > 0:
+                self._test(status[low - 1], status[low], point)
+            if above < len(status):
+                self._test(status[above - 1], status[above], point)
+
+
+def segment_intersections(segments, tolerance=None):
+    """ Find every point where two or more segments meet.
+
+    segments is a sequence of Lines, or an array of x0, y0, x1, y1 rows.
+    Yields (Point, indices) pairs, sweeping left to right, where indices is
+    the sorted tuple of every segment through that point, so a point where
+    three segments cross is reported once. Segments touching within
+    tolerance, which defaults to a billionth of the coordinates' extent,
+    count as meeting. Collinear segments that overlap meet at the ends of
+    the overlap; zero-length segments are ignored.
+
+    >>> lines = [Line(Point(4, 4)), Line(Point(4, 0), Point(0, 4)),
+    ...          Line(Point(6, 5), Point(5, 6))]
+    >>> list(segment_intersections(lines))
+    [(Point(x=2.0, y=2.0), (0, 1))]
+    """
+    for (x, y), indices in _Sweep(segments, tolerance).run():
+        yield Point(x, y), indices
+
+
+def intersection_pairs(segments, tolerance=None):
+    """ Find every intersecting pair of segments.
+
+    Takes the same arguments as segment_intersections. Returns an (m, 2)
+    array of intersection coordinates and an (m, 2) array of the index pairs
+    meeting there, one row per pair, in sweep order.
+
+    >>> intersection_pairs(np.array([[2.3, 5, 8.5, 1.4], [5.8, 1.6, 5.8, 5.2]]))
+    (array([[5.8       , 2.96774194]]), array([[0, 1]]))
+
+    It finds what testing every pair finds, vertical segments included:
+
+    >>> def crosses(p, q):
+    ...     (x0, y0, x1, y1), (x2, y2, x3, y3) = p, q
+    ...     d = (x1 - x0) * (y3 - y2) - (y1 - y0) * (x3 - x2)
+    ...     if d == 0:
+    ...         return False
+    ...     t = ((x2 - x0) * (y3 - y2) - (y2 - y0) * (x3 - x2)) / d
+    ...     u = ((x2 - x0) * (y1 - y0) - (y2 - y0) * (x1 - x0)) / d
+    ...     return 0 <= t <= 1 and 0 <= u <= 1
+    >>> segments = np.random.default_rng(1).random((200, 4)) * 10
+    >>> segments[::3, 2] = segments[::3, 0]
+    >>> _, pairs = intersection_pairs(segments)
+    >>> set(map(tuple, pairs.tolist())) == {
+    ...     pair for pair in combinations(range(200), 2) if crosses(*segments[[*pair]])
+    ... }
+    True
+    """
+    coordinates, pairs = [], []
+    for point, indices in _Sweep(segments, tolerance).run():
+        for pair in combinations(indices, 2):
+            coordinates.append(point)
+            pairs.append(pair)
+    return (
+        np.array(coordinates, dtype=float).reshape(-1, 2),
+        np.array(pairs, dtype=int).reshape(-1, 2),
+    )
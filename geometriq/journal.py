@@ -0,0 +1,441 @@
+import inspect
+import mmap
+import pickle
+import struct
+
+import numpy as np
+
+from .canvas import Canvas, LogSink
+from .colors import Color
+from .shapes import (
+    Point,
+    PointArray,
+    as_coordinates,
+    circle_coordinates,
+    ragged_coordinates,
+    segment_coordinates,
+)
+
+
+"""
+A compact binary journal of canvas calls, and its replay.
+
+A journal starts with a header naming the canvas class, its name, size and
+seed, followed by one record per canvas call: a two byte operation id, a four
+byte payload length and the payload. The first call of each kind is preceded
+by a definition record (operation id 0) giving the method name and how each
+of its parameters is packed:
+
+- points: a count and that many little-endian double x, y pairs
+- cubic: the same, with NaN rows for missing control points, or no list
+- segments, circles: a count and that many x0, y0, x1, y1 or x, y, radius
+  rows of doubles
+- polygons: a count and that many 32-bit vertex counts, then points
+- point, float: doubles
+- color: an id into the journal's colors, defined inline on first use
+- value: a tagged None, bool, int, float or string, or else a pickle
+
+Payload lengths let a reader skip straight past the calls it does not need,
+so seeking to call N only decodes the state changes before it.
+
+Record a journal by logging a canvas in "journal" mode, and replay it into
+any backend with Journal.replay or the geometriq-replay command.
+"""
+
+
+MAGIC = b"GQJ1"
+
+_RECORD = struct.Struct("<HI")
+_DEFINE = 0
+
+_FIELD_KINDS = {
+    "points": "points",
+    "control_points": "points",
+    "control_points_cubic": "cubic",
+    "polygons": "polygons",
+    "lines": "segments",
+    "circles": "circles",
+    "from_point": "point",
+    "to_point": "point",
+    "center": "point",
+    "at_point": "point",
+    "radius": "float",
+    "angle": "float",
+    "rotation": "float",
+    "scale_x": "float",
+    "miter_limit": "float",
+    "stroke_color": "color",
+    "fill_color": "color",
+}
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _PICKLE = range(7)
+
+_double = struct.Struct("<d")
+_pair = struct.Struct("<dd")
+_count = struct.Struct("<I")
+_color = struct.Struct("<i")
+
+
+def _pack_str(out, text):
+    data = text.encode("utf-8")
+    out += _count.pack(len(data))
+    out += data
+
+
+def _pack_value(out, value):
+    if value is None:
+        out.append(_NONE)
+    elif value is True or value is False:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, int) and -(2 ** 63) <= value < 2 ** 63:
+        out.append(_INT)
+        out += struct.pack("<q", value)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _double.pack(value)
+    elif isinstance(value, str):
+        out.append(_STR)
+        _pack_str(out, value)
+    else:
+        out.append(_PICKLE)
+        data = pickle.dumps(value)
+        out += _count.pack(len(data))
+        out += data
+
+
+def _pack_coordinates(out, coordinates):
+    coordinates = np.ascontiguousarray(coordinates, dtype="<f8")
+    out += _count.pack(len(coordinates))
+    out += coordinates.tobytes()
+
+
+class _Reader(object):
+    """ Unpacks fields from a buffer, starting at offset. """
+
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def bytes(self):
+        (length,) = self.unpack(_count)
+        start, self.offset = self.offset, self.offset + length
+        return self.data[start : self.offset]
+
+    def str(self):
+        return bytes(self.bytes()).decode("utf-8")
+
+    def value(self):
+        tag = self.data[self.offset]
+        self.offset += 1
+        if tag == _NONE:
+            return None
+        if tag in (_FALSE, _TRUE):
+            return tag == _TRUE
+        if tag == _INT:
+            return self.unpack(struct.Struct("<q"))[0]
+        if tag == _FLOAT:
+            return self.unpack(_double)[0]
+        if tag == _STR:
+            return self.str()
+        return pickle.loads(self.bytes())
+
+    def coordinates(self, columns=2):
+        (count,) = self.unpack(_count)
+        start, self.offset = self.offset, self.offset + 8 * columns * count
+        return np.frombuffer(self.data[start : self.offset], dtype="<f8").reshape(
+            count, columns
+        )
+
+    def counts(self):
+        (count,) = self.unpack(_count)
+        start, self.offset = self.offset, self.offset + 4 * count
+        return np.frombuffer(self.data[start : self.offset], dtype="<u4").astype(int)
+
+
+class CallEncoder(object):
+    """ Packs calls to a canvas class into journal records. """
+
+    def __init__(self, canvas_class):
+        self.canvas_class = canvas_class
+        self.operations = {}
+        self._colors = {}
+
+    def _define(self, name):
+        method = getattr(self.canvas_class, name)
+        parameters = list(inspect.signature(method).parameters.values())[1:]
+        kinds = [_FIELD_KINDS.get(p.name, "value") for p in parameters]
+        signature = inspect.Signature(parameters)
+
+        operation = len(self.operations) + 1
+        payload = bytearray(struct.pack("<H", operation))
+        _pack_str(payload, name)
+        payload.append(len(kinds))
+        for kind in kinds:
+            _pack_str(payload, kind)
+
+        self.operations[name] = operation, signature, kinds
+        return payload
+
+    def _pack_color(self, out, color):
+        if color is None:
+            out += _color.pack(-1)
+            return
+        key = (color.r, color.g, color.b, color.a, color._name)
+        color_id = self._colors.get(key)
+        if color_id is not None:
+            out += _color.pack(color_id)
+            out.append(0)
+            return
+        color_id = self._colors[key] = len(self._colors)
+        out += _color.pack(color_id)
+        out.append(1)
+        out += struct.pack("<dddd", color.r, color.g, color.b, color.a)
+        _pack_value(out, color._name)
+
+    def encode(self, name, args, kw):
+        """ Pack a call. Returns its records as (operation id, payload) pairs,
+        a definition first if this is the first call of its kind, and the
+        call's arguments by parameter name.
+        """
+        records = []
+        if name not in self.operations:
+            records.append((_DEFINE, self._define(name)))
+        operation, signature, kinds = self.operations[name]
+
+        bound = signature.bind(*args, **kw)
+        bound.apply_defaults()
+
+        payload = bytearray()
+        for kind, value in zip(kinds, bound.arguments.values()):
+            if kind == "points":
+                _pack_coordinates(payload, as_coordinates(value))
+            elif kind == "cubic":
+                if value is None:
+                    payload.append(0)
+                else:
+                    nan = float("nan")
+                    payload.append(1)
+                    _pack_coordinates(
+                        payload,
+                        np.array(
+                            [(nan, nan) if p is None else (p.x, p.y) for p in value]
+                        ).reshape(-1, 2),
+                    )
+            elif kind == "segments":
+                _pack_coordinates(payload, segment_coordinates(value))
+            elif kind == "circles":
+                _pack_coordinates(payload, circle_coordinates(value))
+            elif kind == "polygons":
+                coordinates, counts = ragged_coordinates(value)
+                payload += _count.pack(len(counts))
+                payload += np.ascontiguousarray(counts, dtype="<u4").tobytes()
+                _pack_coordinates(payload, coordinates)
+            elif kind == "point":
+                payload += _pair.pack(value.x, value.y)
+            elif kind == "float":
+                payload += _double.pack(value)
+            elif kind == "color":
+                self._pack_color(payload, value)
+            else:
+                _pack_value(payload, value)
+        records.append((operation, payload))
+        return records, bound.arguments
+
+
+class CallDecoder(object):
+    """ Unpacks journal records back into calls. Definitions, and calls
+    that define colors, must be read in the order they were written.
+    """
+
+    def __init__(self):
+        self.definitions = {}
+        self._colors = {}
+
+    def define(self, data, offset):
+        reader = _Reader(data, offset)
+        (operation,) = reader.unpack(struct.Struct("<H"))
+        name = reader.str()
+        kinds = [reader.str() for _ in range(reader.unpack(struct.Struct("<B"))[0])]
+        stateful = name.startswith("set_") or "color" in kinds
+        self.definitions[operation] = name, kinds, stateful
+
+    def stateful(self, operation):
+        """ Whether calls of this kind change state or define colors. """
+        return self.definitions[operation][2]
+
+    def _color(self, reader):
+        (color_id,) = reader.unpack(_color)
+        if color_id < 0:
+            return None
+        defined = reader.data[reader.offset]
+        reader.offset += 1
+        if defined:
+            r, g, b, a = reader.unpack(struct.Struct("<dddd"))
+            self._colors[color_id] = Color(r, g, b, a, name=reader.value())
+        return self._colors[color_id]
+
+    def decode(self, operation, data, offset):
+        """ Unpack the payload at offset into a name and argument list. """
+        name, kinds, _ = self.definitions[operation]
+        reader = _Reader(data, offset)
+
+        values = []
+        for kind in kinds:
+            if kind == "points":
+                values.append(PointArray.from_coordinates(reader.coordinates()))
+            elif kind == "cubic":
+                listed = reader.data[reader.offset]
+                reader.offset += 1
+                if not listed:
+                    values.append(None)
+                    continue
+                values.append(
+                    [
+                        None if x != x else Point(x, y)
+                        for x, y in reader.coordinates().tolist()
+                    ]
+                )
+            elif kind == "segments":
+                values.append(reader.coordinates(4))
+            elif kind == "circles":
+                values.append(reader.coordinates(3))
+            elif kind == "polygons":
+                counts = reader.counts()
+                values.append((reader.coordinates(), counts))
+            elif kind == "point":
+                values.append(Point(*reader.unpack(_pair)))
+            elif kind == "float":
+                values.append(reader.unpack(_double)[0])
+            elif kind == "color":
+                values.append(self._color(reader))
+            else:
+                values.append(reader.value())
+        return name, values
+
+
+class JournalSink(LogSink):
+    """ Writes a canvas's calls to <name>.gqj as a binary journal. Text log
+    lines, such as the constructor line, have no place in it and are dropped.
+    """
+
+    @classmethod
+    def for_canvas(cls, canvas):
+        return cls("{}.gqj".format(canvas.name), canvas)
+
+    def __init__(self, filename, canvas, batch_size=1 << 16):
+        super(JournalSink, self).__init__(filename, batch_size)
+        self._encoder = CallEncoder(type(canvas))
+        self._buffer = bytearray(MAGIC)
+        _pack_str(self._buffer, type(canvas).__name__)
+        _pack_str(self._buffer, str(canvas.name))
+        _, _, width, height = canvas.viewport
+        self._buffer += _pair.pack(width, height)
+        _pack_value(self._buffer, canvas.seed)
+        self._file = open(filename, "wb")
+
+    def write(self, line):
+        pass
+
+    def record(self, name, args, kw):
+        records, _ = self._encoder.encode(name, args, kw)
+        for operation, payload in records:
+            self._buffer += _RECORD.pack(operation, len(payload))
+            self._buffer += payload
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer = bytearray()
+
+    def close(self):
+        super(JournalSink, self).close()
+        self._file.close()
+
+
+Canvas.log_sinks["journal"] = JournalSink
+
+
+class Journal(object):
+    """ A recorded journal, read back for replay.
+
+    Calls are numbered from 0 in the order they were made. Seeking replays
+    the state changes (set_* calls) made before the first call replayed, so
+    a subrange draws exactly as it did in the full render.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._data[: len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a geometriq journal".format(filename))
+        reader = _Reader(self._data, len(MAGIC))
+        self.canvas_class = reader.str()
+        self.name = reader.str()
+        self.width, self.height = reader.unpack(_pair)
+        self.seed = reader.value()
+
+        self._decoder = CallDecoder()
+        self._offsets, self._operations = self._scan(reader.offset)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _scan(self, offset):
+        offsets, operations = [], []
+        end = len(self._data)
+        while offset < end:
+            operation, length = _RECORD.unpack_from(self._data, offset)
+            if operation == _DEFINE:
+                self._decoder.define(self._data, offset + _RECORD.size)
+            else:
+                offsets.append(offset + _RECORD.size)
+                operations.append(operation)
+            offset += _RECORD.size + length
+        return offsets, operations
+
+    def _decode(self, index):
+        return self._decoder.decode(
+            self._operations[index], self._data, self._offsets[index]
+        )
+
+    def state_before(self, start):
+        """ The last call of each state-setting kind made before call start,
+        in the order they were made, as (name, arguments) pairs.
+        """
+        latest = {}
+        for index in range(min(start, len(self))):
+            if self._decoder.stateful(self._operations[index]):
+                name, arguments = self._decode(index)
+                if name.startswith("set_"):
+                    latest.pop(name, None)
+                    latest[name] = name, arguments
+        return list(latest.values())
+
+    def operations(self, start=0, stop=None):
+        """ Yield (name, arguments) for calls start to stop, exclusive. """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        self.state_before(start)  # defines the colors used before start
+        for index in range(start, stop):
+            yield self._decode(index)
+
+    def replay(self, canvas, start=0, stop=None, skip=("save",)):
+        """ Repeat calls start to stop on canvas, after the state changes
+        that precede them. Calls named in skip are left out.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        for name, arguments in self.state_before(start):
+            getattr(canvas, name)(*arguments)
+        for index in range(start, stop):
+            name, arguments = self._decode(index)
+            if name not in skip:
+                getattr(canvas, name)(*arguments)
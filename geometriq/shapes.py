@@ -2,6 +2,17 @@ from math import cos, pi, sin, sqrt
 import itertools
 import random
 
+import numpy as np
+
+from .bezier import (
+    arc_length_table,
+    cubic_segments,
+    evaluate_segments,
+    flattening_cache,
+    parameters_at_lengths,
+    spline_control_points,
+)
+
 
 def _isclose(a, b, rel_tol=1e-09, abs_tol=0.0):
     return abs(a - b) <= max(rel_tol * max(abs(a), abs(b)), abs_tol)
@@ -32,6 +43,8 @@ class Point:
     True
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -79,6 +92,387 @@ class Point:
 origin = Point(0, 0)
 
 
+class PointArray:
+
+    """ A structure-of-arrays container of two-dimensional points.
+
+    The x and y values live in two contiguous NumPy arrays, so transforms and
+    measurements run over every point at once and backends can consume the raw
+    coordinates without building a Point per vertex. Indexing and iteration
+    still hand back Point objects.
+
+    >>> square = PointArray.from_points([Point(0, 0), Point(0, 2), Point(2, 2), Point(2, 0)])
+    >>> len(square)
+    4
+    >>> square.area
+    -4.0
+    >>> square.translate(Point(1, 1))[0]
+    Point(x=1.0, y=1.0)
+    """
+
+    __slots__ = ("_data", "_count")
+
+    @classmethod
+    def from_points(cls, points):
+        points = list(points)
+        return cls([p.x for p in points], [p.y for p in points])
+
+    @classmethod
+    def from_coordinates(cls, coordinates):
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        return cls(coordinates[:, 0], coordinates[:, 1])
+
+    def __init__(self, xs=(), ys=()):
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        if xs.shape != ys.shape:
+            raise ValueError("xs and ys must have the same length")
+        self._count = len(xs)
+        self._data = np.empty((2, max(self._count, 4)))
+        self._data[0, : self._count] = xs
+        self._data[1, : self._count] = ys
+
+    @property
+    def xs(self):
+        return self._data[0, : self._count]
+
+    @property
+    def ys(self):
+        return self._data[1, : self._count]
+
+    @property
+    def coordinates(self):
+        """ The points as an (n, 2) array of x, y pairs. """
+        return self._data[:, : self._count].T
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for x, y in zip(self.xs.tolist(), self.ys.tolist()):
+            yield Point(x, y)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.__class__(self.xs[index], self.ys[index])
+        x, y = self._data[:, : self._count][:, index].tolist()
+        return Point(x, y)
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __repr__(self):
+        return "PointArray({})".format(self.coordinates.tolist())
+
+    def append(self, point):
+        if self._count == self._data.shape[1]:
+            grown = np.empty((2, self._count * 2))
+            grown[:, : self._count] = self._data
+            self._data = grown
+        self._data[0, self._count] = point.x
+        self._data[1, self._count] = point.y
+        self._count += 1
+
+    def copy(self):
+        return self.__class__(self.xs, self.ys)
+
+    def translate(self, offset):
+        return self.__class__(self.xs + offset.x, self.ys + offset.y)
+
+    def scale(self, scale_x, scale_y=None, about=origin):
+        scale_y = scale_y if scale_y is not None else scale_x
+        return self.__class__(
+            (self.xs - about.x) * scale_x + about.x,
+            (self.ys - about.y) * scale_y + about.y,
+        )
+
+    def rotate(self, angle, about=origin):
+        c, s = cos(angle), sin(angle)
+        dx, dy = self.xs - about.x, self.ys - about.y
+        return self.__class__(
+            dx * c - dy * s + about.x, dx * s + dy * c + about.y
+        )
+
+    def _cross_products(self):
+        xs, ys = self.xs, self.ys
+        next_xs, next_ys = np.roll(xs, -1), np.roll(ys, -1)
+        return xs, ys, next_xs, next_ys, xs * next_ys - next_xs * ys
+
+    @property
+    def area(self) -> float:
+        return 0.5 * float(self._cross_products()[-1].sum())
+
+    @property
+    def centroid(self) -> Point:
+        xs, ys, next_xs, next_ys, cross = self._cross_products()
+        area = 0.5 * float(cross.sum())
+        x = float(((xs + next_xs) * cross).sum())
+        y = float(((ys + next_ys) * cross).sum())
+
+        if area:
+            return Point(x / (6 * area), y / (6 * area))
+        else:
+            return Point(x / 6, y / 6)
+
+
+def point_coordinates(points):
+    """ Return the x, y pairs of a PointArray or a sequence of Points as a list
+    of tuples, without building a Point for PointArray vertices.
+    """
+    if isinstance(points, PointArray):
+        return list(zip(points.xs.tolist(), points.ys.tolist()))
+    return [(p.x, p.y) for p in points if p is not None]
+
+
+def as_coordinates(points):
+    """ Return a PointArray, an array of x, y pairs or a sequence of Points as
+    an (n, 2) float array.
+    """
+    if isinstance(points, PointArray):
+        return points.coordinates
+    if isinstance(points, np.ndarray):
+        return points.astype(float, copy=False).reshape(-1, 2)
+    return np.array(point_coordinates(points), dtype=float).reshape(-1, 2)
+
+
+def ragged_coordinates(polygons):
+    """ Flatten a sequence of Shapes, PointArrays, arrays of x, y pairs or
+    sequences of Points into an (n, 2) array of every vertex and an array of
+    each polygon's vertex count.
+
+    An (m, k, 2) array of m polygons of k vertices, or a (coordinates,
+    counts) tuple as this returns, is flattened without a loop.
+    """
+    if isinstance(polygons, np.ndarray):
+        polygons = polygons.astype(float, copy=False)
+        return polygons.reshape(-1, 2), np.full(len(polygons), polygons.shape[1])
+    if (
+        isinstance(polygons, tuple)
+        and len(polygons) == 2
+        and isinstance(polygons[1], np.ndarray)
+        and polygons[1].ndim == 1
+    ):
+        coordinates, counts = polygons
+        return as_coordinates(coordinates), counts.astype(int, copy=False)
+
+    coordinates, counts = [], []
+    for polygon in polygons:
+        points = polygon.points if isinstance(polygon, Shape) else polygon
+        start = len(coordinates)
+        if isinstance(points, (PointArray, np.ndarray)):
+            coordinates.extend(as_coordinates(points).tolist())
+        else:
+            coordinates.extend(point_coordinates(points))
+        counts.append(len(coordinates) - start)
+    return (
+        np.array(coordinates, dtype=float).reshape(-1, 2),
+        np.array(counts, dtype=int),
+    )
+
+
+def _polygon_sums(polygons, counts, centroids):
+    if counts is None:
+        coordinates, counts = ragged_coordinates(polygons)
+    else:
+        coordinates = as_coordinates(polygons)
+        counts = np.asarray(counts, dtype=int)
+
+    # Pair every vertex with the next one around its own polygon.
+    owners = np.repeat(np.arange(len(counts)), counts)
+    following = np.arange(1, len(coordinates) + 1)
+    ends = np.cumsum(counts)
+    closing = counts > 0
+    following[ends[closing] - 1] = (ends - counts)[closing]
+
+    xs, ys = coordinates[:, 0], coordinates[:, 1]
+    next_xs, next_ys = xs[following], ys[following]
+    cross = xs * next_ys - next_xs * ys
+
+    size = len(counts)
+    areas = 0.5 * np.bincount(owners, weights=cross, minlength=size)
+    if not centroids:
+        return areas, None
+    moments = np.column_stack(
+        (
+            np.bincount(owners, weights=(xs + next_xs) * cross, minlength=size),
+            np.bincount(owners, weights=(ys + next_ys) * cross, minlength=size),
+        )
+    )
+    scale = np.where(areas != 0, 6 * areas, 6)[:, None]
+    return areas, moments / scale
+
+
+def polygon_measures(polygons, counts=None):
+    """ Measure many polygons in one pass.
+
+    polygons is a sequence of Shapes, PointArrays or sequences of Points, or,
+    when counts is given, an (n, 2) array of every polygon's vertices one
+    after the other, counts[i] of them for polygon i. Returns their signed
+    areas, their centroids as an (m, 2) array, and their windings: 1 for
+    counter-clockwise, -1 for clockwise and 0 for degenerate polygons. Each
+    matches the Shape property of the same name.
+
+    >>> areas, centroids, windings = polygon_measures(
+    ...     [Square(2, Point(1, 1)), Square(4, Point(5, 5))])
+    >>> areas
+    array([ -4., -16.])
+    >>> centroids
+    array([[1., 1.],
+           [5., 5.]])
+    >>> windings
+    array([-1, -1], dtype=int8)
+    """
+    areas, centroids = _polygon_sums(polygons, counts, centroids=True)
+    return areas, centroids, np.sign(areas).astype(np.int8)
+
+
+def polygon_areas(polygons, counts=None):
+    """ The signed area of each polygon, see polygon_measures. """
+    return _polygon_sums(polygons, counts, centroids=False)[0]
+
+
+def polygon_centroids(polygons, counts=None):
+    """ The centroid of each polygon as an (m, 2) array, see
+    polygon_measures.
+    """
+    return _polygon_sums(polygons, counts, centroids=True)[1]
+
+
+def polygon_windings(polygons, counts=None):
+    """ The winding of each polygon, see polygon_measures. """
+    return np.sign(polygon_areas(polygons, counts)).astype(np.int8)
+
+
+def segment_coordinates(lines):
+    """ Return a Line, a sequence of Lines, or an array of x0, y0, x1, y1 rows
+    (from center to to_point) as an (n, 4) float array.
+    """
+    if isinstance(lines, np.ndarray):
+        return lines.astype(float, copy=False).reshape(-1, 4)
+    if isinstance(lines, Line):
+        lines = [lines]
+    return np.array(
+        [(l.center.x, l.center.y, l.to_point.x, l.to_point.y) for l in lines],
+        dtype=float,
+    ).reshape(-1, 4)
+
+
+def _line_and_point_arrays(lines, points):
+    single = isinstance(lines, Line)
+    lines = segment_coordinates(lines)
+    points = as_coordinates(points)
+    cx, cy, tx, ty = (lines[:, k, None] for k in range(4))
+    return single, (cx, cy, tx, ty), points[:, 0], points[:, 1]
+
+
+def line_distances(lines, points):
+    """ The perpendicular distance from every point to every line, extended
+    infinitely as in Line.distance_to.
+
+    lines is a Line, a sequence of Lines or an array of x0, y0, x1, y1 rows;
+    points is a PointArray, a sequence of Points or an array of x, y pairs.
+    Returns an array with a row per line and a column per point, or just the
+    row for a single Line. A zero-length line is treated as vertical.
+
+    >>> line_distances(Line(Point(4, 0)), [Point(1, 2), Point(3, -1)])
+    array([2., 1.])
+    >>> line_distances(Line(Point(1, 1), center=Point(1, 1)), [Point(4, 0)])
+    array([3.])
+    """
+    single, (cx, cy, tx, ty), xs, ys = _line_and_point_arrays(lines, points)
+    dx, dy = tx - cx, ty - cy
+    # A zero-length line has no direction; like Line.slope, take it as vertical.
+    dy = np.where((dx == 0) & (dy == 0), 1.0, dy)
+    distances = np.abs(dx * (ys - cy) - dy * (xs - cx)) / np.hypot(dx, dy)
+    return distances[0] if single else distances
+
+
+def line_sides(lines, points):
+    """ Classify every point against every line as Line.compare does: -1 when
+    "above" or "left" of the line, 0 on it, and 1 when "below" or "right".
+
+    Takes the same arguments as line_distances and returns an int8 array of
+    the same shape.
+
+    >>> line_sides(Line(Point(4, 4)), [Point(0, 1), Point(1, 1), Point(1, 0)])
+    array([-1,  0,  1], dtype=int8)
+    """
+    single, (cx, cy, tx, ty), xs, ys = _line_and_point_arrays(lines, points)
+    vertical = cx == tx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = (cy - ty) / (cx - tx)
+    slopes = np.where(vertical, 0.0, slopes)
+    intercepts = cy - cx * slopes
+    sides = np.where(
+        vertical, np.sign(xs - cx), np.sign(intercepts - (ys - xs * slopes))
+    ).astype(np.int8)
+    return sides[0] if single else sides
+
+
+def circle_coordinates(circles):
+    """ Return a Circle, a sequence of Circles, or an array of x, y, radius
+    rows as an (n, 3) float array.
+    """
+    if isinstance(circles, np.ndarray):
+        return circles.astype(float, copy=False).reshape(-1, 3)
+    if isinstance(circles, Circle):
+        circles = [circles]
+    return np.array(
+        [(c.center.x, c.center.y, c.size) for c in circles], dtype=float
+    ).reshape(-1, 3)
+
+
+def circle_line_intersections(circles, lines, segments=False):
+    """ Intersect every line with every circle at once.
+
+    circles is a Circle, a sequence of Circles or an array of x, y, radius
+    rows; lines is a Line, a sequence of Lines or an array of x0, y0, x1, y1
+    rows. Returns a points array shaped (lines, circles, 2, 2) holding the
+    two intersections of each pair, ordered as Circle.intersections_with_line
+    orders them, and a boolean mask shaped (lines, circles, 2) saying which
+    of them exist. Lines are infinite unless segments is true, in which case
+    only points between each line's ends count. The lines and circles axes
+    are dropped for a single Line or Circle.
+
+    >>> points, valid = circle_line_intersections(
+    ...     Circle(5), Line(Point(5, 5)), segments=True)
+    >>> valid
+    array([False,  True])
+    >>> points[1].round(4)
+    array([3.5355, 3.5355])
+    """
+    single_circle, single_line = isinstance(circles, Circle), isinstance(lines, Line)
+    circles, lines = circle_coordinates(circles), segment_coordinates(lines)
+
+    starts = lines[:, None, :2]
+    directions = lines[:, None, 2:] - starts
+    lengths = np.hypot(directions[..., 0], directions[..., 1])[..., None]
+    units = directions / lengths
+    # Point every line rightwards (or upwards, when vertical) so the first
+    # point of each pair is the leftmost (or lowest).
+    flip = (units[..., 0] < 0) | ((units[..., 0] == 0) & (units[..., 1] < 0))
+    units = np.where(flip[..., None], -units, units)
+
+    offsets = circles[None, :, :2] - starts
+    along = (offsets * units).sum(axis=-1)
+    squared_distances = (offsets ** 2).sum(axis=-1) - along ** 2
+    squared_half_chords = circles[None, :, 2] ** 2 - squared_distances
+    half_chords = np.sqrt(np.maximum(squared_half_chords, 0))
+
+    parameters = np.stack((along - half_chords, along + half_chords), axis=-1)
+    points = starts[..., None, :] + parameters[..., None] * units[..., None, :]
+    valid = np.repeat((squared_half_chords >= 0)[..., None], 2, axis=-1)
+    if segments:
+        signed = np.where(flip, -1, 1)[..., None] * parameters
+        valid &= (signed >= 0) & (signed <= lengths)
+
+    if single_circle:
+        points, valid = points[:, 0], valid[:, 0]
+    if single_line:
+        points, valid = points[0], valid[0]
+    return points, valid
+
+
 class Shape:
 
     """ A generic model for a regular polygon. Has a center Point(), and a
@@ -92,11 +486,59 @@ class Shape:
     [<Point x: 2, y: 1>]
     """
 
-    def __init__(self, size=0, points: list[Point] | None = None, center=origin, grid=None):
+    __slots__ = ("center", "size", "grid", "_points", "_bounds")
+
+    def __init__(
+        self,
+        size=0,
+        points: list[Point] | PointArray | None = None,
+        center=origin,
+        grid=None,
+    ):
         self.center = center
         self.size = size
         self.grid = grid
-        self.points = points or []
+        self.points = points if points is not None else []
+
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self._points_changed()
+
+    def _points_changed(self):
+        # Drop whatever is cached from the points; subclasses extend this.
+        self._bounds = None
+
+    @property
+    def bounds(self):
+        """ The shape's extent as (min x, min y, max x, max y), or None if it
+        has none. Cached until its points are replaced or added to.
+        """
+        if self._bounds is None:
+            self._bounds = self._compute_bounds()
+        return self._bounds
+
+    def _compute_bounds(self):
+        if isinstance(self.points, PointArray):
+            coordinates = self.points.coordinates
+        else:
+            coordinates = as_coordinates(self.points)
+        if not len(coordinates):
+            return None
+        low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    def _around_center(self, radius):
+        return (
+            self.center.x - radius,
+            self.center.y - radius,
+            self.center.x + radius,
+            self.center.y + radius,
+        )
 
     def paths(self):
         end_points = self.points[:]
@@ -107,13 +549,27 @@ class Shape:
         if self.grid:
             point = self.grid.closest_point_to(point)
         self.points.append(point)
+        self._points_changed()
 
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
-        points_to_draw = filter(None, self.points)
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
+        if isinstance(self.points, PointArray):
+            points_to_draw = self.points
+        else:
+            points_to_draw = [p for p in self.points if p is not None]
+        points_to_draw = canvas.clipped_polygon(
+            points_to_draw, at_point, rotation, scale_x, scale_y
+        )
+        if not len(points_to_draw):
+            return
         canvas.draw_polygon(points_to_draw, at_point, rotation, scale_x, scale_y)
 
     @property
     def area(self) -> float:
+        if isinstance(self.points, PointArray):
+            return self.points.area
+
         area = 0
         for i in range(len(self.points)):
             p1, p2 = self.points[i], self.points[(i + 1) % len(self.points)]
@@ -124,13 +580,17 @@ class Shape:
 
     @property
     def centroid(self) -> Point:
-        x, y = 0, 0
-        area = self.area
+        if isinstance(self.points, PointArray):
+            return self.points.centroid
+
+        x, y, area = 0, 0, 0
         for i in range(len(self.points)):
             p1, p2 = self.points[i], self.points[(i + 1) % len(self.points)]
             cross_product = (p1.x * p2.y - p2.x * p1.y)
             x += (p1.x + p2.x) * cross_product
             y += (p1.y + p2.y) * cross_product
+            area += cross_product
+        area *= 0.5
 
         if area:
             return Point(x / (6 * area), y / (6 * area))
@@ -139,6 +599,8 @@ class Shape:
 
 
 class Line(Shape):
+    __slots__ = ("to_point", "slope", "intercept", "inverse_slope")
+
     @classmethod
     def from_origin_with_slope(cls, center, slope, direction=1):
         if slope is None:  # vertical line
@@ -241,14 +703,46 @@ class Line(Shape):
         return Line.from_origin_with_slope(point, self.inverse_slope)
 
     def distance_to(self, point):
-        perpendicular = self.line_to(point)
-        return self.intersection_with(perpendicular).distance_to(point)
+        """ The distance from point to this line, extended infinitely. A
+        zero-length line is treated as vertical, as in line_distances.
 
-    def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
-        canvas.draw_line(
-            self.center, self.to_point, at_point, rotation, scale_x, scale_y
+        >>> Line(Point(4, 0)).distance_to(Point(1, 2))
+        2.0
+        >>> Line(Point(1, 1), center=Point(1, 1)).distance_to(Point(4, 0))
+        3.0
+        """
+        dx = self.to_point.x - self.center.x
+        dy = self.to_point.y - self.center.y
+        if dx == 0 and dy == 0:
+            return float(abs(point.x - self.center.x))
+        return abs(
+            dx * (point.y - self.center.y) - dy * (point.x - self.center.x)
+        ) / sqrt(dx * dx + dy * dy)
+
+    def distances_to(self, points):
+        """ The distance from each of an array of points to this line. """
+        return line_distances(self, points)
+
+    def sides_of(self, points):
+        """ Compare each of an array of points with this line, see compare. """
+        return line_sides(self, points)
+
+    def _compute_bounds(self):
+        return (
+            min(self.center.x, self.to_point.x),
+            min(self.center.y, self.to_point.y),
+            max(self.center.x, self.to_point.x),
+            max(self.center.y, self.to_point.y),
         )
 
+    def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
+        for run in canvas.clipped_polyline(
+            [self.center, self.to_point], at_point, rotation, scale_x, scale_y
+        ):
+            canvas.draw_line(run[0], run[-1], at_point, rotation, scale_x, scale_y)
+
     def contains(self, point):
         if self.slope is None:
             return _isclose(self.center.x, point.x)
@@ -328,29 +822,126 @@ class ArbitraryTriangle:
         return 0.5 * self.AB.length * self.AB.distance_to(self.C)
 
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
-        points_to_draw = filter(None, self.points)
+        points_to_draw = [p for p in self.points if p is not None]
         canvas.draw_polygon(points_to_draw, at_point, rotation, scale_x, scale_y)
 
 
 class Rectangle(Line):
+    __slots__ = ()
+
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         points = [
             self.center,
             Point(self.center.x, self.to_point.y),
             self.to_point,
             Point(self.to_point.x, self.center.y),
         ]
+        points = canvas.clipped_polygon(points, at_point, rotation, scale_x, scale_y)
+        if not len(points):
+            return
         canvas.draw_polygon(points, at_point, rotation, scale_x, scale_y)
 
 
-class Curve(Shape):
+class _BezierPath(Shape):
+    """ Common evaluation for paths made of quadratic or cubic Bézier segments.
+
+    The segment array and arc length table are computed on first use and
+    cached until the path's points are replaced or added to. A path with no
+    segments has length 0 and evaluates to empty PointArrays.
+    """
+
+    arc_length_samples = 32
+
+    def _points_changed(self):
+        super(_BezierPath, self)._points_changed()
+        self._segments = None
+        self._arc_length_table = None
+
+    def segments(self):
+        """ The path as an (n, 4, 2) array of cubic segments. """
+        if getattr(self, "_segments", None) is None:
+            self._segments = self._build_segments()
+        return self._segments
+
+    def _build_segments(self):
+        raise NotImplementedError
+
+    def evaluate(self, t):
+        """ Return a PointArray of the path at parameters t, where segment n
+        runs from t = n to t = n + 1.
+        """
+        segments = self.segments()
+        if not len(segments):
+            return PointArray.from_coordinates(np.empty((0, 2)))
+        return PointArray.from_coordinates(evaluate_segments(segments, t))
+
+    def _arc_lengths(self):
+        if getattr(self, "_arc_length_table", None) is None:
+            self._arc_length_table = arc_length_table(
+                self.segments(), self.arc_length_samples
+            )
+        return self._arc_length_table
+
+    @property
+    def length(self):
+        if not len(self.segments()):
+            return 0.0
+        return float(self._arc_lengths()[1][-1])
+
+    def points_at_distances(self, distances):
+        """ Return a PointArray of the points at each distance along the path. """
+        if not len(self.segments()):
+            return PointArray.from_coordinates(np.empty((0, 2)))
+        parameters = parameters_at_lengths(self._arc_lengths(), distances)
+        return self.evaluate(parameters)
+
+    def evenly_spaced_points(self, count):
+        """ Return a PointArray of count points spaced evenly along the path,
+        from its start to its end.
+        """
+        return self.points_at_distances(np.linspace(0, self.length, count))
+
+    def _compute_bounds(self):
+        # A Bézier path lies within the hull of its control points.
+        segments = self.segments()
+        if not len(segments):
+            return None
+        coordinates = segments.reshape(-1, 2)
+        low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+
+    def flatten(self, tolerance):
+        """ Return the path as a polyline PointArray that stays within
+        tolerance of the curve. Results are cached per geometry and scale.
+        """
+        return PointArray.from_coordinates(
+            flattening_cache.flatten(self.segments(), tolerance)
+        )
+
+
+class Curve(_BezierPath):
     def __init__(self, points, control_points, control_points_cubic=[], center=origin):
-        super(Curve, self).__init__(0, center)
+        super(Curve, self).__init__(0, center=center)
         self.points = points
         self.control_points = control_points
         self.control_points_cubic = control_points_cubic
 
+    def _build_segments(self):
+        cubic = self.control_points_cubic
+        if cubic:
+            nan = float("nan")
+            cubic = [(nan, nan) if p is None else (p.x, p.y) for p in cubic]
+        return cubic_segments(
+            as_coordinates(self.points),
+            as_coordinates(self.control_points),
+            cubic or None,
+        )
+
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         canvas.draw_curve(
             self.points,
             self.control_points,
@@ -362,118 +953,110 @@ class Curve(Shape):
         )
 
 
-class SplineCurve(Shape):
-    def __init__(self, points, closed=False):
-        self.points = points
-        self.closed = closed
-        (
-            self.first_control_points,
-            self.second_control_points,
-        ) = self.generate_control_points(points)
-
-    def generate_control_points(self, points):
-        count = len(points) - 1
+class SplineCurve(_BezierPath):
+    """ A smooth cubic spline through a sequence of points.
 
-        first_control_points = [None for x in range(count)]
-        second_control_points = []
+    A closed spline also joins the last point back to the first, smoothly;
+    repeating the first point at the end is optional. The control points are
+    solved again when the points are replaced or added to.
+    """
 
-        if count == 1:
-            p0 = points[0]
-            p3 = points[1]
+    @classmethod
+    def batch(cls, point_sequences, closed=False):
+        """ Build a SplineCurve for each sequence of points, solving every
+        spline of the same length in one vectorized call.
+        """
+        point_sequences = [list(points) for points in point_sequences]
+        splines = [None] * len(point_sequences)
+
+        by_length = {}
+        for position, points in enumerate(point_sequences):
+            knots = cls._knots(points, closed)
+            by_length.setdefault(len(knots), []).append((position, knots))
+
+        for entries in by_length.values():
+            # knots along the first axis, then one batch axis per spline
+            stacked = np.stack([knots for _, knots in entries], axis=1)
+            first, second = spline_control_points(stacked, closed)
+            for column, (position, _) in enumerate(entries):
+                splines[position] = cls(
+                    point_sequences[position],
+                    closed,
+                    control_points=(first[:, column], second[:, column]),
+                )
 
-            p1 = Point((2 * p0.x + p3.x) / 3, (2 * p0.y + p3.y) / 3)
-            first_control_points = [p1]
+        return splines
 
-            p2 = Point((2 * p1.x - p0.x), (2 * p1.y - p0.y))
-            second_control_points = [p2]
+    @staticmethod
+    def _knots(points, closed):
+        knots = as_coordinates(points)
+        if closed and len(knots) > 2 and (knots[0] == knots[-1]).all():
+            knots = knots[:-1]
+        return knots
 
-        else:
-            rhs = []
-            a = []
-            b = []
-            c = []
-
-            for i in range(count):
-                p0 = points[i]
-                p3 = points[i + 1]
-
-                if i == 0:
-                    a.append(0)
-                    b.append(2)
-                    c.append(1)
-                    rhs_point = Point((p0.x + 2 * p3.x), (p0.y + 2 * p3.y))
-                elif i == count - 1:
-                    a.append(2)
-                    b.append(7)
-                    c.append(0)
-                    rhs_point = Point((8 * p0.x + p3.x), (8 * p0.y + p3.y))
-                else:
-                    a.append(1)
-                    b.append(4)
-                    c.append(1)
-                    rhs_point = Point((4 * p0.x + 2 * p3.x), (4 * p0.y + 2 * p3.y))
-
-                rhs.append(rhs_point)
-
-            for j in range(1, count):
-                rhs_point = rhs[j]
-                prev_rhs_point = rhs[j - 1]
-
-                m = a[j] / b[j - 1]
-                b1 = b[j] - m * c[j - 1]
-                b[j] = b1
-
-                new_rhs_point = Point(
-                    (rhs_point.x - m * prev_rhs_point.x),
-                    (rhs_point.y - m * prev_rhs_point.y),
-                )
-                rhs[j] = new_rhs_point
+    def __init__(self, points, closed=False, control_points=None):
+        super(SplineCurve, self).__init__(0, points=points)
+        self.closed = closed
 
-            last_rhs_point = rhs[count - 1]
-            last_control_point = Point(
-                (last_rhs_point.x / b[count - 1]), (last_rhs_point.y / b[count - 1])
+        if control_points is None:
+            control_points = spline_control_points(
+                self._knots(points, closed), closed
             )
-            first_control_points[count - 1] = last_control_point
-
-            for f in range(count - 1, -1, -1):
-                try:
-                    next_control_point = first_control_points[f + 1]
-                except IndexError:
-                    continue
-                this_rhs_point = rhs[f]
-                this_control_point = Point(
-                    (this_rhs_point.x - c[f] * next_control_point.x) / b[f],
-                    (this_rhs_point.y - c[f] * next_control_point.y) / b[f],
-                )
-                first_control_points[f] = this_control_point
+        first, second = control_points
+        self._control_points = (
+            [Point(x, y) for x, y in first.tolist()],
+            [Point(x, y) for x, y in second.tolist()],
+        )
 
-            for s in range(count):
-                p3 = points[s + 1]
+    def _points_changed(self):
+        super(SplineCurve, self)._points_changed()
+        self._control_points = None
 
-                if s == count - 1:
-                    try:
-                        p1 = first_control_points[s]
-                    except IndexError:
-                        continue
+    def _solved_control_points(self):
+        if self._control_points is None:
+            self._control_points = self.generate_control_points(self.points)
+        return self._control_points
 
-                    second_control_point = Point((p3.x + p1.x) / 2, (p3.y + p1.y) / 2)
-                else:
-                    try:
-                        next_p1 = first_control_points[s + 1]
-                    except IndexError:
-                        continue
+    @property
+    def first_control_points(self):
+        return self._solved_control_points()[0]
 
-                    second_control_point = Point(
-                        2 * p3.x - next_p1.x, 2 * p3.y - next_p1.y
-                    )
+    @property
+    def second_control_points(self):
+        return self._solved_control_points()[1]
 
-                second_control_points.append(second_control_point)
+    def generate_control_points(self, points):
+        first, second = spline_control_points(
+            self._knots(points, self.closed), self.closed
+        )
+        return (
+            [Point(x, y) for x, y in first.tolist()],
+            [Point(x, y) for x, y in second.tolist()],
+        )
 
-        return first_control_points, second_control_points
+    @property
+    def knots(self):
+        """ The points the curve passes through, ending back at the first for
+        a closed spline.
+        """
+        coordinates = self._knots(self.points, self.closed).tolist()
+        knots = [Point(x, y) for x, y in coordinates]
+        if self.closed and knots:
+            knots.append(knots[0])
+        return knots
+
+    def _build_segments(self):
+        return cubic_segments(
+            as_coordinates(self.knots),
+            point_coordinates(self.first_control_points),
+            point_coordinates(self.second_control_points),
+        )
 
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         canvas.draw_curve(
-            self.points,
+            self.knots if self.closed else self.points,
             self.first_control_points,
             self.second_control_points,
             at_point,
@@ -485,10 +1068,15 @@ class SplineCurve(Shape):
 
 class Arc(Shape):
     def __init__(self, size, angle, center=origin):
-        super(Arc, self).__init__(size, center)
+        super(Arc, self).__init__(size, center=center)
         self.angle = angle
 
+    def _compute_bounds(self):
+        return self._around_center(self.size)
+
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         canvas.draw_arc(
             self.size, self.angle, self.center, at_point, rotation, scale_x, scale_y
         )
@@ -506,10 +1094,15 @@ class HalfCircle(Arc):
 
 class CircleSegment(Shape):
     def __init__(self, size, angle, center=origin):
-        super(CircleSegment, self).__init__(size, center)
+        super(CircleSegment, self).__init__(size, center=center)
         self.angle = angle
 
+    def _compute_bounds(self):
+        return self._around_center(self.size)
+
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         canvas.draw_circular_segment(
             self.size, self.angle, self.center, at_point, rotation, scale_x, scale_y
         )
@@ -527,7 +1120,7 @@ class HalfCircleSegment(CircleSegment):
 
 class Circle(Shape):
     def __init__(self, size, center=origin):
-        super(Circle, self).__init__(size, center)
+        super(Circle, self).__init__(size, center=center)
 
     def intersections_with_line(self, line):
         # line: y = mx + b
@@ -558,18 +1151,66 @@ class Circle(Shape):
                 # Outside the circle, return None
                 return None
         else:
+            # general case - project the center onto the line, then step
+            # half a chord either way along it, leftmost point first
+            dx = line.to_point.x - line.center.x
+            dy = line.to_point.y - line.center.y
+            length = sqrt(dx ** 2 + dy ** 2)
+            ux, uy = (dx, dy) if dx > 0 else (-dx, -dy)
+            ux, uy = ux / length, uy / length
+            along = (self.center.x - line.center.x) * ux + (
+                self.center.y - line.center.y
+            ) * uy
+            foot_x, foot_y = line.center.x + along * ux, line.center.y + along * uy
+            try:
+                half_chord = sqrt(
+                    self.size ** 2
+                    - (self.center.x - foot_x) ** 2
+                    - (self.center.y - foot_y) ** 2
+                )
+            except ValueError:
+                # Outside the circle, return None
+                return None
+            return (
+                Point(foot_x - half_chord * ux, foot_y - half_chord * uy),
+                Point(foot_x + half_chord * ux, foot_y + half_chord * uy),
+            )
+
+    def intersections_with_segment(self, line):
+        """ Like intersections_with_line, but only the points between the
+        line's center and to_point count. Returns a tuple of one or two
+        Points, or None.
+        """
+        points = self.intersections_with_line(line)
+        if points is None:
             return None
+        dx = line.to_point.x - line.center.x
+        dy = line.to_point.y - line.center.y
+        squared_length = dx ** 2 + dy ** 2
+        on_segment = tuple(
+            p
+            for p in points
+            if 0
+            <= (p.x - line.center.x) * dx + (p.y - line.center.y) * dy
+            <= squared_length
+        )
+        return on_segment or None
 
     def point_at_angle(self, angle) -> Point:
         return Point(self.size * cos(angle) + self.center.x, self.size * sin(angle) + self.center.y)
 
+    def _compute_bounds(self):
+        return self._around_center(self.size)
+
     def draw(self, canvas, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        if not canvas.is_visible(self.bounds, at_point, rotation, scale_x, scale_y):
+            return
         canvas.draw_circle(self.size, self.center, at_point, rotation, scale_x, scale_y)
 
 
 class _Triangle(Shape):
     def __init__(self, size, center=origin, grid=None):
-        super(_Triangle, self).__init__(size, center, grid)
+        super(_Triangle, self).__init__(size, center=center, grid=grid)
 
         self.step = sqrt(self.size ** 2 - (self.size / 2) ** 2)
         self.r = sqrt(3) * self.size / 6
@@ -649,7 +1290,7 @@ class WestTriangle(_Triangle):
 
 class HexagonalRhombus(Shape):
     def __init__(self, size, center=origin, grid=None):
-        super(HexagonalRhombus, self).__init__(size, center, grid)
+        super(HexagonalRhombus, self).__init__(size, center=center, grid=grid)
 
         self.step = sqrt(self.size ** 2 - (self.size / 2) ** 2)
 
@@ -668,7 +1309,7 @@ class HexagonalRhombus(Shape):
 
 class Square(Shape):
     def __init__(self, size, center=origin):
-        super(Square, self).__init__(size, center)
+        super(Square, self).__init__(size, center=center)
 
         x, y, sz = self.center.x, self.center.y, size / 2
 
@@ -685,7 +1326,7 @@ class Square(Shape):
 
 class Diamond(Shape):
     def __init__(self, size, center=origin):
-        super(Diamond, self).__init__(size, center)
+        super(Diamond, self).__init__(size, center=center)
         self.step = sqrt(self.size ** 2 / 2)
         x, y = self.center.x, self.center.y
 
@@ -702,7 +1343,7 @@ class Diamond(Shape):
 
 class _Hexagon(Shape):
     def __init__(self, size, center=origin, grid=None):
-        super(_Hexagon, self).__init__(size, center, grid)
+        super(_Hexagon, self).__init__(size, center=center, grid=grid)
 
         self.step = sqrt(self.size ** 2 - (self.size / 2) ** 2)
 
@@ -0,0 +1,188 @@
+import heapq
+
+import numpy as np
+
+from .shapes import Point, PointArray
+
+
+class KDTree(object):
+    """ A static two-dimensional k-d tree over a cloud of points.
+
+    The tree is built once, in O(n log n), and then answers nearest, k-nearest
+    and radius queries in roughly O(log n) each. It accepts a sequence of
+    Points, a PointArray, or an (n, 2) array of coordinates; queries that
+    return points hand back the original Point objects when it was built from
+    them.
+
+    >>> tree = KDTree([Point(0, 0), Point(3, 4), Point(10, 10)])
+    >>> tree.nearest(Point(2, 3))
+    Point(x=3, y=4)
+    >>> tree.nearest_k(Point(0, 1), 2)
+    [Point(x=0, y=0), Point(x=3, y=4)]
+    >>> tree.within(Point(0, 0), 5)
+    [Point(x=0, y=0), Point(x=3, y=4)]
+    """
+
+    def __init__(self, points, leaf_size=16):
+        if isinstance(points, PointArray):
+            self._points = None
+            coordinates = points.coordinates
+        elif isinstance(points, np.ndarray):
+            self._points = None
+            coordinates = points.reshape(-1, 2)
+        else:
+            self._points = list(points)
+            coordinates = [(p.x, p.y) for p in self._points]
+
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.leaf_size = max(1, int(leaf_size))
+
+        self._build(coordinates)
+
+    def __len__(self):
+        return len(self._order)
+
+    def _build(self, coordinates):
+        count = len(coordinates)
+        order = np.arange(count)
+
+        # Per-node arrays; a node whose left child is -1 is a leaf covering
+        # the slice [start, stop) of the reordered coordinates.
+        starts, stops, dims, splits, lefts, rights = [], [], [], [], [], []
+
+        def new_node(start, stop):
+            starts.append(start)
+            stops.append(stop)
+            dims.append(0)
+            splits.append(0.0)
+            lefts.append(-1)
+            rights.append(-1)
+            return len(starts) - 1
+
+        pending = [new_node(0, count)] if count else []
+        while pending:
+            node = pending.pop()
+            start, stop = starts[node], stops[node]
+            if stop - start <= self.leaf_size:
+                continue
+
+            indices = order[start:stop]
+            spread = np.ptp(coordinates[indices], axis=0)
+            dim = int(spread[1] > spread[0])
+            middle = (start + stop) // 2
+
+            partition = np.argpartition(coordinates[indices, dim], middle - start)
+            order[start:stop] = indices[partition]
+
+            dims[node] = dim
+            splits[node] = float(coordinates[order[middle], dim])
+            lefts[node] = new_node(start, middle)
+            rights[node] = new_node(middle, stop)
+            pending.extend((lefts[node], rights[node]))
+
+        self._order = order
+        self._xs = np.ascontiguousarray(coordinates[order, 0])
+        self._ys = np.ascontiguousarray(coordinates[order, 1])
+        self._starts, self._stops = starts, stops
+        self._dims, self._splits = dims, splits
+        self._lefts, self._rights = lefts, rights
+        self._positions = None
+
+    def _leaf_distances(self, node, x, y):
+        start, stop = self._starts[node], self._stops[node]
+        d2 = (self._xs[start:stop] - x) ** 2 + (self._ys[start:stop] - y) ** 2
+        return start, d2.tolist()
+
+    def query(self, point, k=1):
+        """ Return the distances and indices of the k points closest to
+        point, nearest first. Indices refer to the order the points were
+        given in.
+        """
+        if not len(self) or k < 1:
+            return [], []
+
+        x, y = point.x, point.y
+        best = []  # max-heap of (-squared distance, position)
+        pending = [(0, 0.0)]
+
+        while pending:
+            node, bound = pending.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+
+            if self._lefts[node] == -1:
+                start, distances = self._leaf_distances(node, x, y)
+                for offset, d2 in enumerate(distances):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, start + offset))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, start + offset))
+                continue
+
+            diff = (y if self._dims[node] else x) - self._splits[node]
+            if diff < 0:
+                near, far = self._lefts[node], self._rights[node]
+            else:
+                near, far = self._rights[node], self._lefts[node]
+            pending.append((far, max(bound, diff * diff)))
+            pending.append((near, bound))
+
+        best.sort(reverse=True)
+        distances = [float(np.sqrt(-d2)) for d2, _ in best]
+        indices = [int(self._order[position]) for _, position in best]
+        return distances, indices
+
+    def query_radius(self, point, radius):
+        """ Return the indices of every point within radius of point, in no
+        particular order.
+        """
+        if not len(self):
+            return []
+
+        x, y = point.x, point.y
+        r2 = radius * radius
+        found = []
+        pending = [0]
+
+        while pending:
+            node = pending.pop()
+            if self._lefts[node] == -1:
+                start, distances = self._leaf_distances(node, x, y)
+                found.extend(
+                    start + offset for offset, d2 in enumerate(distances) if d2 <= r2
+                )
+                continue
+
+            diff = (y if self._dims[node] else x) - self._splits[node]
+            if diff < 0 or diff * diff <= r2:
+                pending.append(self._lefts[node])
+            if diff >= 0 or diff * diff <= r2:
+                pending.append(self._rights[node])
+
+        return [int(self._order[position]) for position in found]
+
+    def _point_at(self, index):
+        if self._points is not None:
+            return self._points[index]
+        if self._positions is None:
+            self._positions = np.argsort(self._order)
+        position = self._positions[index]
+        return Point(float(self._xs[position]), float(self._ys[position]))
+
+    def nearest(self, point):
+        """ Return the point closest to point, or None if the tree is empty. """
+        _, indices = self.query(point, 1)
+        return self._point_at(indices[0]) if indices else None
+
+    def nearest_k(self, point, k):
+        """ Return up to k points closest to point, nearest first. """
+        _, indices = self.query(point, k)
+        return [self._point_at(i) for i in indices]
+
+    def within(self, point, radius):
+        """ Return every point within radius of point, nearest first. """
+        indices = self.query_radius(point, radius)
+        return sorted(
+            (self._point_at(i) for i in indices),
+            key=lambda p: (p.x - point.x) ** 2 + (p.y - point.y) ** 2,
+        )
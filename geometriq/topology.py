@@ -0,0 +1,202 @@
+import numpy as np
+
+
+def _padded_rows(rows, values, count):
+    """ Group values by row into a (count, width) array padded with -1. """
+    order = np.argsort(rows, kind="stable")
+    rows, values = rows[order], values[order]
+    counts = np.bincount(rows, minlength=count)
+    width = int(counts.max()) if len(counts) else 0
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    padded = np.full((count, width), -1, dtype=int)
+    padded[rows, np.arange(len(rows)) - starts[rows]] = values
+    return padded
+
+
+class GridTopology(object):
+    """ Array-backed adjacency of the cells of a Grid.
+
+    Cells are numbered 0 to n - 1 in the order of the cells array, which holds
+    each cell's grid index. Every table is an integer array with one row per
+    cell, padded with -1 where a cell has fewer entries:
+
+    - vertex_ids: the ids of the cell's vertices, in shape order
+    - edges: the id of each side, side n joining vertices n and n + 1
+    - neighbours: the cell across each side, aligned with edges
+    - vertex_neighbours: every other cell sharing at least one vertex
+
+    edge_cells maps each edge id to the one or two cells it borders.
+
+    Built by Grid.topology(); only cells lying wholly inside the grid count.
+    """
+
+    def __init__(self, grid, cells, kind):
+        self.grid = grid
+        self.kind = kind
+
+        vertices = grid.cell_vertices(cells, kind)
+        inside = grid.contains_indices(vertices[..., 0], vertices[..., 1]).all(axis=1)
+        self.cells = np.asarray(cells, dtype=int)[inside]
+        vertices = vertices[inside]
+
+        column = 2 * grid.max_j + 1
+        self.vertex_count = (2 * grid.max_i + 1) * column
+        self.vertex_ids = (vertices[..., 0] + grid.max_i) * column + (
+            vertices[..., 1] + grid.max_j
+        )
+
+        self._build_edges()
+        self._build_vertex_neighbours()
+        self._build_lookup()
+        self._packed = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _build_edges(self):
+        count, sides = self.vertex_ids.shape
+        start = self.vertex_ids
+        end = np.roll(self.vertex_ids, -1, axis=1)
+        keys = np.minimum(start, end).astype(np.int64) * self.vertex_count
+        keys += np.maximum(start, end)
+        _, edge_ids = np.unique(keys.ravel(), return_inverse=True)
+        edge_ids = edge_ids.ravel()
+        edge_count = int(edge_ids.max()) + 1 if len(edge_ids) else 0
+        owners = np.repeat(np.arange(count), sides)
+
+        order = np.argsort(edge_ids, kind="stable")
+        sorted_edges, sorted_owners = edge_ids[order], owners[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_edges[1:] != sorted_edges[:-1]
+
+        self.edge_cells = np.full((edge_count, 2), -1, dtype=int)
+        self.edge_cells[sorted_edges[first], 0] = sorted_owners[first]
+        self.edge_cells[sorted_edges[~first], 1] = sorted_owners[~first]
+
+        bordering = self.edge_cells[edge_ids]
+        across = np.where(bordering[:, 0] == owners, bordering[:, 1], bordering[:, 0])
+        self.edges = edge_ids.reshape(count, sides)
+        self.neighbours = across.reshape(count, sides)
+
+    def _build_vertex_neighbours(self):
+        count, sides = self.vertex_ids.shape
+        vertex_ids = self.vertex_ids.ravel()
+        owners = np.repeat(np.arange(count), sides)
+        order = np.lexsort((owners, vertex_ids))
+        vertex_ids, owners = vertex_ids[order], owners[order]
+
+        # Incidences are sorted by vertex, so cells sharing a vertex sit in a
+        # run; pair every incidence with the ones up to a run's length after it.
+        firsts, seconds = [], []
+        for distance in range(1, len(vertex_ids)):
+            shared = vertex_ids[distance:] == vertex_ids[:-distance]
+            if not shared.any():
+                break
+            firsts.append(owners[:-distance][shared])
+            seconds.append(owners[distance:][shared])
+
+        if firsts:
+            firsts, seconds = np.concatenate(firsts), np.concatenate(seconds)
+            keys = np.concatenate((firsts, seconds)).astype(np.int64) * count
+            keys += np.concatenate((seconds, firsts))
+            keys.sort()
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+            rows, values = keys // count, keys % count
+            distinct = rows != values
+            rows, values = rows[distinct], values[distinct]
+        else:
+            rows = values = np.empty(0, dtype=int)
+
+        self.vertex_neighbours = _padded_rows(rows, values, count)
+
+    def _build_lookup(self):
+        if not len(self.cells):
+            self._lowest = np.zeros(self.cells.shape[1], dtype=int)
+            self._spans = np.zeros(self.cells.shape[1], dtype=int)
+            self._lookup = np.empty(0, dtype=int)
+            return
+
+        self._lowest = self.cells.min(axis=0)
+        self._spans = self.cells.max(axis=0) - self._lowest + 1
+        self._lookup = np.full(int(np.prod(self._spans)), -1, dtype=int)
+        offsets = (self.cells - self._lowest).T
+        self._lookup[np.ravel_multi_index(tuple(offsets), self._spans)] = np.arange(
+            len(self.cells)
+        )
+
+    def ids_of(self, indices):
+        """ Map an array of cell indices to cell ids, -1 where the index is
+        not a cell of this topology.
+        """
+        indices = np.asarray(indices, dtype=int).reshape(-1, len(self._spans))
+        offsets = indices - self._lowest
+        inside = ((offsets >= 0) & (offsets < self._spans)).all(axis=1)
+        ids = np.full(len(indices), -1, dtype=int)
+        if inside.any():
+            flat = np.ravel_multi_index(tuple(offsets[inside].T), self._spans)
+            ids[inside] = self._lookup[flat]
+        return ids
+
+    def id_of(self, index):
+        """ Return the id of the cell with the given index, or None. """
+        cell_id = int(self.ids_of([index])[0])
+        return cell_id if cell_id >= 0 else None
+
+    def index_of(self, cell_id):
+        return tuple(self.cells[cell_id].tolist())
+
+    def shape(self, cell_id):
+        """ Build the shape of the cell with the given id. """
+        return self.grid.cell_shape(self.index_of(cell_id), self.kind)
+
+    def _neighbour_table(self, vertex):
+        table = self.vertex_neighbours if vertex else self.neighbours
+        if vertex not in self._packed:
+            # Move each row's valid entries to its front for random choice.
+            order = np.argsort(table < 0, axis=1, kind="stable")
+            packed = np.take_along_axis(table, order, axis=1)
+            self._packed[vertex] = packed, (table >= 0).sum(axis=1)
+        return self._packed[vertex]
+
+    def neighbours_of(self, cell_id, vertex=False):
+        """ Return the ids of the cells next to cell_id, sharing an edge or,
+        with vertex=True, at least a vertex.
+        """
+        packed, degree = self._neighbour_table(vertex)
+        return packed[cell_id, : degree[cell_id]]
+
+    def random_walk(self, starts, steps, seed=None, vertex=False):
+        """ Walk from each start cell to a random neighbour, steps times, all
+        walkers at once. Returns a (steps + 1, walkers) array of cell ids;
+        a walker on a cell without neighbours stays put.
+        """
+        packed, degree = self._neighbour_table(vertex)
+        random = np.random.default_rng(seed)
+        current = np.atleast_1d(np.asarray(starts, dtype=int))
+
+        path = np.empty((steps + 1, len(current)), dtype=int)
+        path[0] = current
+        for step in range(1, steps + 1):
+            choices = degree[current]
+            picks = (random.random(len(current)) * np.maximum(choices, 1)).astype(int)
+            current = np.where(choices > 0, packed[current, picks], current)
+            path[step] = current
+        return path
+
+    def neighbourhood(self, cell_ids, steps, vertex=False):
+        """ Return the sorted ids of every cell within steps moves of any of
+        cell_ids, including themselves.
+        """
+        packed, _ = self._neighbour_table(vertex)
+        reached = np.zeros(len(self.cells), dtype=bool)
+        frontier = np.unique(np.atleast_1d(np.asarray(cell_ids, dtype=int)))
+        reached[frontier] = True
+
+        for _ in range(steps):
+            following = packed[frontier].ravel()
+            following = np.unique(following[following >= 0])
+            frontier = following[~reached[following]]
+            if not len(frontier):
+                break
+            reached[frontier] = True
+        return np.flatnonzero(reached)
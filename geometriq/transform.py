@@ -0,0 +1,145 @@
+from math import cos, sin
+
+import numpy as np
+
+from .shapes import Point, as_coordinates, origin
+
+
+"""
+Affine transforms of the plane.
+
+A Transform holds the six coefficients CoreGraphics uses for its CTM, and
+maps x, y to (a * x + c * y + tx, b * x + d * y + ty). Transforms compose
+with @, the right-hand one applying first, and map whole coordinate arrays at
+once. The identity transform is recognised, so placing a shape at the origin,
+unrotated and unscaled, costs nothing.
+"""
+
+
+class Transform:
+
+    """ An affine transform of the plane.
+
+    >>> placement = Transform.placement(Point(10, 0), rotation=0, scale_x=2)
+    >>> placement.apply_point(Point(1, 1))
+    Point(x=22.0, y=2.0)
+    >>> placement.inverse().apply_point(Point(22, 2))
+    Point(x=1.0, y=1.0)
+    >>> Transform.placement(origin, 0, 1).is_identity
+    True
+    """
+
+    __slots__ = ("a", "b", "c", "d", "tx", "ty")
+
+    @classmethod
+    def translation(cls, x, y):
+        return cls(1, 0, 0, 1, x, y)
+
+    @classmethod
+    def scaling(cls, scale_x, scale_y=None):
+        scale_y = scale_y if scale_y is not None else scale_x
+        return cls(scale_x, 0, 0, scale_y, 0, 0)
+
+    @classmethod
+    def rotation(cls, angle):
+        c, s = cos(angle), sin(angle)
+        return cls(c, s, -s, c, 0, 0)
+
+    @classmethod
+    def placement(cls, at_point=origin, rotation=0, scale_x=1, scale_y=None):
+        """ The transform the draw methods apply to a shape: rotate it about
+        the origin, move it to at_point, then scale the result.
+        """
+        scale_y = scale_y if scale_y is not None else scale_x
+        if not rotation and not at_point.x and not at_point.y:
+            if scale_x == 1 and scale_y == 1:
+                return identity
+            return cls(scale_x, 0, 0, scale_y, 0, 0)
+        c, s = cos(rotation), sin(rotation)
+        return cls(
+            scale_x * c,
+            scale_y * s,
+            -scale_x * s,
+            scale_y * c,
+            scale_x * at_point.x,
+            scale_y * at_point.y,
+        )
+
+    def __init__(self, a=1, b=0, c=0, d=1, tx=0, ty=0):
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.tx = tx
+        self.ty = ty
+
+    @property
+    def is_identity(self):
+        return (self.a, self.b, self.c, self.d, self.tx, self.ty) == (1, 0, 0, 1, 0, 0)
+
+    def as_tuple(self):
+        return self.a, self.b, self.c, self.d, self.tx, self.ty
+
+    def __matmul__(self, other):
+        """ The transform that applies other, then self. """
+        if other.is_identity:
+            return self
+        if self.is_identity:
+            return other
+        return Transform(
+            self.a * other.a + self.c * other.b,
+            self.b * other.a + self.d * other.b,
+            self.a * other.c + self.c * other.d,
+            self.b * other.c + self.d * other.d,
+            self.a * other.tx + self.c * other.ty + self.tx,
+            self.b * other.tx + self.d * other.ty + self.ty,
+        )
+
+    def inverse(self):
+        """ The transform undoing this one. Raises ZeroDivisionError when it
+        collapses the plane, as a zero scale does.
+        """
+        if self.is_identity:
+            return self
+        determinant = self.a * self.d - self.b * self.c
+        a, b = self.d / determinant, -self.b / determinant
+        c, d = -self.c / determinant, self.a / determinant
+        return Transform(
+            a, b, c, d, -(a * self.tx + c * self.ty), -(b * self.tx + d * self.ty)
+        )
+
+    def apply(self, points):
+        """ Map a PointArray, an array of x, y pairs or a sequence of Points,
+        returning an (n, 2) array. The identity hands back the coordinates
+        unchanged.
+        """
+        coordinates = as_coordinates(points)
+        if self.is_identity:
+            return coordinates
+        xs, ys = coordinates[:, 0], coordinates[:, 1]
+        return np.column_stack(
+            (
+                self.a * xs + self.c * ys + self.tx,
+                self.b * xs + self.d * ys + self.ty,
+            )
+        )
+
+    def apply_point(self, point):
+        return Point(
+            self.a * point.x + self.c * point.y + self.tx,
+            self.b * point.x + self.d * point.y + self.ty,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Transform) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        return "Transform(a={}, b={}, c={}, d={}, tx={}, ty={})".format(
+            *self.as_tuple()
+        )
+
+
+identity = Transform()
@@ -20,11 +20,13 @@ setuptools.setup(
     ),
     install_requires=[
         "click >= 6.0",
+        "numpy >= 1.20",
         "opensimplex >= 0.2",
         "pyobjc;platform_system=='Darwin'",
     ],
     entry_points="""
         [console_scripts]
         geometriq=geometriq.geometriq_cli:geometriq_cli
+        geometriq-replay=geometriq.geometriq_cli:geometriq_replay
     """,
 )